@@ -614,38 +614,39 @@ class DeckBuilderLayout(Layout):
         where the dragged card will go if you drop it.
 
         """
+        ud = touch.ud
         if (
-                'card' not in touch.ud or
-                'layout' not in touch.ud or
-                touch.ud['layout'] != self
+                'card' not in ud or
+                'layout' not in ud or
+                ud['layout'] != self
         ):
             return
-        if (
-                touch.ud['layout'] == self and
-                not hasattr(touch.ud['card'], '_topdecked')
-        ):
-            touch.ud['card']._topdecked = InstructionGroup()
-            touch.ud['card']._topdecked.add(touch.ud['card'].canvas)
-            self.canvas.after.add(touch.ud['card']._topdecked)
+        dragged = ud['card']
+        if not hasattr(dragged, '_topdecked'):
+            dragged._topdecked = InstructionGroup()
+            dragged._topdecked.add(dragged.canvas)
+            self.canvas.after.add(dragged._topdecked)
+        (tx, ty) = touch.pos
+        descending = self.direction == 'descending'
         i = 0
         for deck in self.decks:
             cards = [card for card in deck if not card.dragging]
             maxidx = max(card.idx for card in cards) if cards else 0
-            if self.direction == 'descending':
+            if descending:
                 cards.reverse()
             cards_collided = [
-                card for card in cards if card.collide_point(*touch.pos)
+                card for card in cards if card.collide_point(tx, ty)
             ]
             if cards_collided:
                 collided = cards_collided.pop()
                 for card in cards_collided:
                     if card.idx > collided.idx:
                         collided = card
-                if collided.deck == touch.ud['deck']:
+                if collided.deck == ud['deck']:
                     self.insertion_card = (
                         1 if collided.idx == 0 else
                         maxidx + 1 if collided.idx == maxidx else
-                        collided.idx + 1 if collided.idx > touch.ud['idx']
+                        collided.idx + 1 if collided.idx > ud['idx']
                         else collided.idx
                     )
                 else:
@@ -663,20 +664,16 @@ class DeckBuilderLayout(Layout):
                 if self.insertion_deck == i:
                     if self.insertion_card in (0, len(deck)):
                         pass
-                    elif self.point_before_card(
-                            cards[0], *touch.pos
-                    ):
+                    elif self.point_before_card(cards[0], tx, ty):
                         self.insertion_card = 0
-                    elif self.point_after_card(
-                        cards[-1], *touch.pos
-                    ):
+                    elif self.point_after_card(cards[-1], tx, ty):
                         self.insertion_card = cards[-1].idx
                 else:
                     j = 0
                     for found in self._foundations:
                         if (
                                 found is not None and
-                                found.collide_point(*touch.pos)
+                                found.collide_point(tx, ty)
                         ):
                             self.insertion_deck = j
                             self.insertion_card = 0
@@ -759,24 +756,28 @@ class DeckBuilderLayout(Layout):
         phy += self.deck_y_hint_step * i + self.deck_y_hint_offsets[i]
         (w, h) = self.size
         (x, y) = self.pos
+        (shw, shh) = self.card_size_hint
+        card_size = (w * shw, h * shh)
+        xstep = self.card_x_hint_step
+        ystep = self.card_y_hint_step
+        children = self.children
         # start assigning pos and size to cards
         found = self._get_foundation(i)
-        if found in self.children:
+        if found in children:
             self.remove_widget(found)
         self.add_widget(found)
         for card in cards:
             if card is not None:
-                if card in self.children:
+                if card in children:
                     self.remove_widget(card)
-                (shw, shh) = self.card_size_hint
                 card.pos = (
                     x + phx * w,
                     y + phy * h
                 )
-                card.size = (w * shw, h * shh)
+                card.size = card_size
                 self.add_widget(card)
-            phx += self.card_x_hint_step
-            phy += self.card_y_hint_step
+            phx += xstep
+            phy += ystep
 
 
 class DeckBuilderView(DeckBuilderLayout, StencilView):
@@ -156,9 +156,6 @@ class ConfigListItem(BoxLayout):
 
 class StatListViewConfigurator(BaseStatListView):
     statlist = ObjectProperty()
-    _key_cfg_setters = DictProperty()
-    _val_text_setters = DictProperty()
-    _control_wids = DictProperty()
 
     def set_config(self, key, option, value):
         super().set_config(key, option, value)
@@ -182,8 +179,8 @@ class StatListViewConfigurator(BaseStatListView):
         del self.mirror[key]
         self.statlist.del_key(key)
 
-    def munge(self, k, v):
-        ret = super().munge(k, v)
+    def munge_common(self):
+        ret = super().munge_common()
         ret['on_control'] = self.inst_set_control
         ret['on_config'] = self.inst_set_configs
         ret['deleter'] = self.del_key
@@ -172,10 +172,17 @@ class StatRowListItemContainer(BoxLayout):
                 self.label.text = str(self.key)
             self.bind(key=updlabel)
             self.add_widget(self.label)
+        cls = self.licls[self.control]
         if hasattr(self, 'wid'):
+            if type(self.wid) is cls:
+                # Everything but the control is bound through to the
+                # widget already. It only needs to show the value for
+                # what might be a different key now.
+                self.wid._pull()
+                return
+            self.unbind(**self._wid_binds)
             self.remove_widget(self.wid)
             del self.wid
-        cls = self.licls[self.control]
         self.wid = cls(
             key=self.key,
             gett=self.gett,
@@ -184,14 +191,12 @@ class StatRowListItemContainer(BoxLayout):
             listen=self.listen,
             unlisten=self.unlisten
         )
-        self.bind(
-            key=self.wid.setter('key'),
-            gett=self.wid.setter('gett'),
-            sett=self.wid.setter('sett'),
-            config=self.wid.setter('config'),
-            listen=self.wid.setter('listen'),
-            unlisten=self.wid.setter('unlisten')
-        )
+        self._wid_binds = {
+            prop: self.wid.setter(prop) for prop in (
+                'key', 'gett', 'sett', 'config', 'listen', 'unlisten'
+            )
+        }
+        self.bind(**self._wid_binds)
         self.add_widget(self.wid)
 
 
@@ -329,21 +334,34 @@ class BaseStatListView(RecycleView):
         if self.mirror != new:
             self.mirror = new
 
-    def munge(self, k, v):
+    def munge_common(self):
+        """Return the part of a row's data that's the same for every stat."""
+        remote = self.remote
         return {
-            'key': k,
             'reg': self._reg_widget,
             'unreg': self._unreg_widget,
-            'gett': self.remote.__getitem__,
+            'gett': remote.__getitem__,
             'sett': self.set_value,
-            'listen': self.remote.connect,
-            'unlisten': self.remote.disconnect,
-            'control': self.control.get(k, 'readout'),
-            'config': self.config.get(k, default_cfg)
+            'listen': remote.connect,
+            'unlisten': remote.disconnect
         }
 
     def upd_data(self, *args):
-        self.data = [self.munge(k, v) for k, v in self.iter_data()]
+        if self.remote is None:
+            self.data = []
+            return
+        common = self.munge_common()
+        control = self.control
+        config = self.config
+        self.data = [
+            dict(
+                common,
+                key=k,
+                control=control.get(k, 'readout'),
+                config=config.get(k, default_cfg)
+            )
+            for k, v in self.iter_data()
+        ]
     _trigger_upd_data = trigger(upd_data)
 
     def _reg_widget(self, w, *args):
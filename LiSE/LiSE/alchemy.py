@@ -653,6 +653,12 @@ def queries(table, view):
             [t.c.name, t.c.plaincode]
         )
 
+    def func_table_name_bytecode(t):
+        """Select the ``name`` and ``bytecode`` columns."""
+        return select(
+            [t.c.name, t.c.bytecode]
+        )
+
     def func_table_get(t):
         """Get all columns for a given function (except ``name``).
 
@@ -788,6 +794,8 @@ def queries(table, view):
     for functyp in functyps:
         r['func_{}_name_plaincode'.format(functyp)] \
             = func_table_name_plaincode(table[functyp])
+        r['func_{}_name_bytecode'.format(functyp)] \
+            = func_table_name_bytecode(table[functyp])
         r['func_{}_iter'.format(functyp)] = func_table_iter(table[functyp])
         r['func_{}_get'.format(functyp)] = func_table_get(table[functyp])
         r['func_{}_ins'.format(functyp)] = func_table_ins(table[functyp])
@@ -2318,7 +2326,7 @@ def queries(table, view):
     r['rulebooks_rules'] = select([
         rulebooks.c.rulebook,
         rulebooks.c.rule
-    ]).order_by(rulebooks.c.idx)
+    ]).order_by(rulebooks.c.rulebook, rulebooks.c.idx)
 
     r['ct_rulebook_rules'] = select(
         [func.COUNT(rulebooks.c.rule)]
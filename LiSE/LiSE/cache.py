@@ -1,4 +1,5 @@
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from functools import wraps
 from allegedb.cache import (
     Cache,
     NodesCache,
@@ -10,6 +11,37 @@ from allegedb.cache import (
 from .util import singleton_get
 
 
+memo_size = 1024
+
+
+def memoized(fun):
+    """Remember what the method returns until its cache next stores
+    something.
+
+    Only the last ``memo_size`` results are kept. Lookups are keyed by
+    time, so when time moves on without any new stores, the oldest ones
+    are the ones that won't be asked for again.
+
+    """
+    name = fun.__name__
+
+    @wraps(fun)
+    def memoizer(self, *args):
+        key = (name,) + args
+        try:
+            return self.memo[key]
+        except KeyError:
+            if len(self.memo) >= memo_size:
+                self.memo.popitem(last=False)
+            ret = self.memo[key] = fun(self, *args)
+            return ret
+    return memoizer
+
+
+def defaultdict_dict():
+    return defaultdict(dict)
+
+
 class UniversalCache(Cache):
     def store(self, key, branch, tick, value):
         super().store(None, key, branch, tick, value)
@@ -27,8 +59,11 @@ class AvatarnessCache(Cache):
         self.soloav = StructuredDefaultDict(1, FuturistWindowDict)
         self.uniqav = StructuredDefaultDict(1, FuturistWindowDict)
         self.uniqgraph = StructuredDefaultDict(1, FuturistWindowDict)
+        self.memo = OrderedDict()
+        """Results of the ``get_char_*`` lookups since the last store."""
 
     def store(self, character, graph, node, branch, tick, is_avatar):
+        self.memo.clear()
         if not is_avatar:
             is_avatar = None
         Cache.store(self, character, graph, node, branch, tick, is_avatar)
@@ -62,53 +97,58 @@ class AvatarnessCache(Cache):
                 except HistoryError:
                     avmap[tick] = set()
         if is_avatar:
-            if graphavs[tick]:
-                soloav[tick] = None
-            else:
-                soloav[tick] = node
-            if charavs[tick]:
-                uniqav[tick] = None
-            else:
-                uniqav[tick] = (graph, node)
-            if graphs[tick]:
-                uniqgraph[tick] = None
-            else:
-                uniqgraph[tick] = graph
             graphavs[tick].add(node)
             charavs[tick].add((graph, node))
             graphs[tick].add(graph)
         else:
             graphavs[tick].remove(node)
             charavs[tick].remove((graph, node))
-            soloav[tick] = singleton_get(graphavs[tick])
-            uniqav[tick] = singleton_get(charavs[tick])
             if not graphavs[tick]:
                 graphs[tick].remove(graph)
-                if len(graphs[tick]) == 1:
-                    uniqgraph[tick] = next(iter(graphs[tick]))
-                else:
-                    uniqgraph[tick] = None
-
+        # singleton_get stops at the second item, so these are cheap
+        # however many avatars there are
+        soloav[tick] = singleton_get(graphavs[tick])
+        uniqav[tick] = singleton_get(charavs[tick])
+        uniqgraph[tick] = singleton_get(graphs[tick])
+
+    @memoized
+    def get_char_avs(self, char, branch, tick):
+        """Return a tuple of the ``(graph, node)`` pairs that are ``char``'s
+        avatars at the time.
+
+        It's a snapshot, so rules run while iterating it may add or
+        remove avatars. It's remade only after the next ``store``.
+
+        """
+        return tuple(self._forward_valcache(
+            self.charavs[char], branch, tick
+        ) or ())
+
+    @memoized
     def get_char_graph_avs(self, char, graph, branch, tick):
         return self._forward_valcache(
             self.graphavs[(char, graph)], branch, tick
         ) or set()
 
+    @memoized
     def get_char_graph_solo_av(self, char, graph, branch, tick):
         return self._forward_valcache(
             self.soloav[(char, graph)], branch, tick, copy=False
         )
 
+    @memoized
     def get_char_only_av(self, char, branch, tick):
         return self._forward_valcache(
             self.uniqav[char], branch, tick, copy=False
         )
 
+    @memoized
     def get_char_only_graph(self, char, branch, tick):
         return self._forward_valcache(
             self.uniqgraph[char], branch, tick, copy=False
         )
 
+    @memoized
     def get_char_graphs(self, char, branch, tick):
         return self._forward_valcache(
             self.graphs[char], branch, tick
@@ -117,11 +157,13 @@ class AvatarnessCache(Cache):
     def iter_node_users(self, graph, node, branch, tick):
         if graph not in self.user_order:
             return
-        for character in self.user_order[graph][node]:
+        users = self.user_order[graph][node]
+        for character in users:
             if (graph, node, character, branch) not in self.user_shallow:
+                branches = users[character]
                 for (b, t) in self.allegedb._active_branches(branch, tick):
-                    if b in self.user_order[graph][node][character]:
-                        isav = self.user_order[graph][node][character][b][t]
+                    if b in branches:
+                        isav = branches[b][t]
                         self.store(character, graph, node, b, t, isav)
                         self.store(character, graph, node, branch, tick, isav)
                         break
@@ -292,7 +334,7 @@ class NodeRulebookCache(object):
 class PortalRulebookCache(object):
     def __init__(self, engine):
         self.engine = engine
-        self._data = defaultdict(lambda: defaultdict(dict))
+        self._data = defaultdict(defaultdict_dict)
         self.shallow = {}
 
     def store(self, character, nodeA, nodeB, rulebook):
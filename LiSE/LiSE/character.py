@@ -26,8 +26,7 @@ and their node in the physical world is an avatar of it.
 
 from collections import (
     Mapping,
-    MutableMapping,
-    Callable
+    MutableMapping
 )
 from operator import ge, gt, le, lt, eq
 from math import floor
@@ -40,7 +39,6 @@ from allegedb.graph import (
     GraphSuccessorsMapping,
     DiGraphPredecessorsMapping
 )
-from allegedb.cache import FuturistWindowDict, PickyDefaultDict
 
 from .xcollections import CompositeDict
 from .rule import RuleBook, RuleMapping
@@ -49,7 +47,7 @@ from .node import Node
 from .thing import Thing
 from .place import Place
 from .portal import Portal
-from .util import getatt, reify, singleton_get
+from .util import getatt, reify
 from .query import StatusAlias
 from .exc import AmbiguousAvatarError, WorldIntegrityError
 
@@ -656,6 +654,7 @@ class SenseFuncWrap(object):
     provided with its name, and prefills the first two arguments.
 
     """
+    __slots__ = ['character', 'fun']
 
     engine = getatt('character.engine')
 
@@ -676,9 +675,10 @@ class SenseFuncWrap(object):
 
     def __call__(self, observed):
         """Call the function, prefilling the engine and observer arguments."""
+        engine = self.engine
         if isinstance(observed, str):
-            observed = self.engine.character[observed]
-        return self.fun(self.engine, self.character, Facade(observed))
+            observed = engine.character[observed]
+        return self.fun(engine, self.character, Facade(observed))
 
 
 class CharacterSense(object):
@@ -687,6 +687,7 @@ class CharacterSense(object):
     but haven't yet specified what character to look at
 
     """
+    __slots__ = ['container', 'sensename']
 
     engine = getatt('container.engine')
     observer = getatt('container.character')
@@ -699,13 +700,15 @@ class CharacterSense(object):
     @property
     def func(self):
         """Return the function most recently associated with this sense."""
-        fn = self.engine.query.sense_func_get(
-            self.observer.name,
+        engine = self.engine
+        observer = self.observer
+        fn = engine.query.sense_func_get(
+            observer.name,
             self.sensename,
-            *self.engine.time
+            *engine.time
         )
         if fn is not None:
-            return SenseFuncWrap(self.observer, fn)
+            return SenseFuncWrap(observer, fn)
 
     def __call__(self, observed):
         """Call my sense function and make sure it returns the right type,
@@ -713,10 +716,7 @@ class CharacterSense(object):
 
         """
         r = self.func(observed)
-        if not (
-                isinstance(r, Character) or
-                isinstance(r, Facade)
-        ):
+        if not isinstance(r, (Character, Facade)):
             raise TypeError(
                 "Sense function did not return a character-like object"
             )
@@ -745,10 +745,7 @@ class CharacterSenseMapping(MutableMapping, RuleFollower, Signal):
 
     def __len__(self):
         """Count active senses."""
-        n = 0
-        for sense in iter(self):
-            n += 1
-        return n
+        return sum(1 for _ in self)
 
     def __getitem__(self, k):
         """Get a :class:`CharacterSense` named ``k`` if it exists."""
@@ -767,7 +764,7 @@ class CharacterSenseMapping(MutableMapping, RuleFollower, Signal):
         else:
             funn = v.__name__
         if funn not in self.engine.sense:
-            if not isinstance(v, Callable):
+            if not callable(v):
                 raise TypeError("Not a function")
             self.engine.sense[funn] = v
         (branch, tick) = self.engine.time
@@ -795,7 +792,7 @@ class CharacterSenseMapping(MutableMapping, RuleFollower, Signal):
 
     def __call__(self, fun, name=None):
         """Decorate the function so it's mine now."""
-        if not isinstance(fun, Callable):
+        if not callable(fun):
             raise TypeError(
                 "I need a function here"
             )
@@ -804,10 +801,36 @@ class CharacterSenseMapping(MutableMapping, RuleFollower, Signal):
         self[name] = fun
 
 
+# Facade mappings share this empty mask until they have something to
+# mask, whereupon they get a set of their own.
+nomask = frozenset()
+
+
+def patched_len(real, patch, masked):
+    """Count the keys in ``real`` as overlaid by ``patch`` and ``masked``.
+
+    Only looks at the patched and masked keys, so it doesn't matter
+    how big ``real`` is, so long as its ``len`` is cheap.
+
+    """
+    n = len(real)
+    for k in patch:
+        if k in real:
+            n -= 1
+        if k not in masked:
+            n += 1
+    for k in masked:
+        if k in real and k not in patch:
+            n -= 1
+    return n
+
+
 class FacadePlace(MutableMapping, Signal):
 
     """Lightweight analogue of Place for Facade use."""
 
+    _masked = nomask
+
     @property
     def name(self):
         return self['name']
@@ -825,7 +848,6 @@ class FacadePlace(MutableMapping, Signal):
 
         """
         self._patch = kwargs
-        self._masked = set()
         super().__init__()
         if isinstance(real_or_name, Place) or \
            isinstance(real_or_name, FacadePlace):
@@ -834,39 +856,38 @@ class FacadePlace(MutableMapping, Signal):
             self._real = {'name': real_or_name}
 
     def __iter__(self):
-        seen = set()
+        patch = self._patch
+        masked = self._masked
+        if not patch and not masked:
+            yield from self._real
+            return
         for k in self._real:
-            if k not in self._masked:
-                yield k
-            seen.add(k)
-        for k in self._patch:
-            if (
-                    k not in self._masked and
-                    k not in seen
-            ):
+            if k not in masked and k not in patch:
                 yield k
+        yield from patch
 
     def __len__(self):
-        n = 0
-        for k in self:
-            n += 1
-        return n
+        return patched_len(self._real, self._patch, self._masked)
 
     def __getitem__(self, k):
-        if k in self._masked:
-            raise KeyError("{} has been masked.".format(k))
         if k in self._patch:
             return self._patch[k]
+        if k in self._masked:
+            raise KeyError("{} has been masked.".format(k))
         return self._real[k]
 
     def __setitem__(self, k, v):
         if k == 'name':
             raise TypeError("Can't change names")
-        self._masked.discard(k)
+        if k in self._masked:
+            self._masked.remove(k)
         self._patch[k] = v
         self.send(self, key=k, val=v)
 
     def __delitem__(self, k):
+        self._patch.pop(k, None)
+        if not self._masked:
+            self._masked = set()
         self._masked.add(k)
         self.send(self, key=k, val=None)
 
@@ -927,7 +948,6 @@ class FacadePortal(FacadePlace):
 
     def __init__(self, real_or_origin, destination=None, **kwargs):
         self._patch = kwargs
-        self._masked = set()
         if destination is None:
             if not (
                     isinstance(real_or_origin, Portal) or
@@ -981,44 +1001,47 @@ class FacadeEntityMapping(MutableMapping, Signal):
     """
 
     engine = getatt('facade.engine')
+    _masked = nomask
 
     def __init__(self, facade):
         """Store the facade."""
         super().__init__()
         self.facade = facade
         self._patch = {}
-        self._masked = set()
+        self._inner = None
+
+    def _inner_map(self):
+        """Return the mapping I'm a view of, looking it up only once."""
+        if self._inner is None:
+            self._inner = self._get_inner_map()
+        return self._inner
 
     def __contains__(self, k):
-        return (
-            k not in self._masked and (
-                k in self._patch or
-                k in self._get_inner_map()
-            )
-        )
+        # nothing's ever both patched and masked
+        if k in self._patch:
+            return True
+        return k not in self._masked and k in self._inner_map()
 
     def __iter__(self):
-        seen = set()
-        for k in self._get_inner_map():
-            if k not in self._masked:
-                yield k
-            seen.add(k)
-        for k in self._patch:
-            if k not in seen:
+        patch = self._patch
+        masked = self._masked
+        if not patch and not masked:
+            yield from self._inner_map()
+            return
+        for k in self._inner_map():
+            if k not in masked and k not in patch:
                 yield k
+        yield from patch
 
     def __len__(self):
-        n = 0
-        for k in self:
-            n += 1
-        return n
+        return patched_len(self._inner_map(), self._patch, self._masked)
 
     def __getitem__(self, k):
-        if k in self._masked:
-            raise KeyError("masked")
         if k in self._patch:
             return self._patch[k]
-        return self.facadecls(self.facade, self._get_inner_map()[k])
+        if k in self._masked:
+            raise KeyError("masked")
+        return self.facadecls(self.facade, self._inner_map()[k])
 
     def __setitem__(self, k, v):
         if not isinstance(v, self.facadecls):
@@ -1027,11 +1050,15 @@ class FacadeEntityMapping(MutableMapping, Signal):
                     "Need :class:``Thing`` or :class:``FacadeThing``"
                 )
             v = self.facadecls(self.facade, v)
-        self._masked.discard(k)
+        if k in self._masked:
+            self._masked.remove(k)
         self._patch[k] = v
         self.send(self, key=k, val=v)
 
     def __delitem__(self, k):
+        self._patch.pop(k, None)
+        if not self._masked:
+            self._masked = set()
         self._masked.add(k)
         self.send(self, key=k, val=None)
 
@@ -1061,20 +1088,30 @@ class FacadePortalPredecessors(FacadeEntityMapping):
 
 
 class FacadePortalMapping(FacadeEntityMapping):
+    def __init__(self, facade):
+        super().__init__(facade)
+        self._cache = {}
+
     def __getitem__(self, node):
         if node in self._masked:
             raise KeyError("masked")
         if node in self._patch:
             return self._patch[node]
-        return self.cls(self.facade, node)
+        if node not in self._cache:
+            self._cache[node] = self.cls(self.facade, node)
+        return self._cache[node]
 
     def __setitem__(self, node, value):
-        self._masked.discard(node)
+        if node in self._masked:
+            self._masked.remove(node)
         v = self.cls(self.facade, node)
         v.update(value)
         self._patch[node] = v
 
     def __delitem__(self, node):
+        self._patch.pop(node, None)
+        if not self._masked:
+            self._masked = set()
         self._masked.add(node)
 
 
@@ -1115,49 +1152,51 @@ class Facade(AbstractCharacter, nx.DiGraph):
             return self.facade.character.preportal
 
     class StatMapping(MutableMapping, Signal):
+        _real = getatt('facade.character.graph')
+        _masked = nomask
+
         def __init__(self, facade):
             super().__init__()
             self.facade = facade
             self._patch = {}
-            self._masked = set()
 
         def __iter__(self):
-            seen = set()
-            for k in self.facade.graph:
-                if k not in self._masked:
-                    yield k
-                seen.add(k)
-            for k in self._patch:
-                if k not in seen:
+            patch = self._patch
+            masked = self._masked
+            if not patch and not masked:
+                yield from self._real
+                return
+            for k in self._real:
+                if k not in masked and k not in patch:
                     yield k
+            yield from patch
 
         def __len__(self):
-            n = 0
-            for k in self:
-                n += 1
-            return n
+            return patched_len(self._real, self._patch, self._masked)
 
         def __contains__(self, k):
-            if k in self._masked:
-                return False
-            return (
-                k in self._patch or
-                k in self.facade.graph
-            )
+            # nothing's ever both patched and masked
+            if k in self._patch:
+                return True
+            return k not in self._masked and k in self._real
 
         def __getitem__(self, k):
-            if k in self._masked:
-                raise KeyError("masked")
             if k in self._patch:
                 return self._patch[k]
-            return self.facade.graph[k]
+            if k in self._masked:
+                raise KeyError("masked")
+            return self._real[k]
 
         def __setitem__(self, k, v):
-            self._masked.discard(k)
+            if k in self._masked:
+                self._masked.remove(k)
             self._patch[k] = v
             self.send(self, key=k, val=v)
 
         def __delitem__(self, k):
+            self._patch.pop(k, None)
+            if not self._masked:
+                self._masked = set()
             self._masked.add(k)
             self.send(self, key=k, val=None)
 
@@ -1192,13 +1231,17 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
     def character(self):
         return self
 
-    def __init__(self, engine, name, data=None, **attr):
+    def __init__(
+            self, engine, name, data=None, *, init_rulebooks=True, **attr
+    ):
         """Store engine and name, and set up mappings for Thing, Place, and
         Portal
 
+        Pass ``init_rulebooks=False`` when the character is already in
+        the database, to skip inserting its row again.
+
         """
         super().__init__(engine, name, data, **attr)
-        self._avatars_cache = PickyDefaultDict(FuturistWindowDict)
         d = {}
         for mapp in (
                 'character',
@@ -1213,10 +1256,11 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
                 d[mapp] = rulebook.name \
                     if isinstance(rulebook, RuleBook) \
                     else rulebook
-        self.engine.query.init_character(
-            self.name,
-            **d
-        )
+        if init_rulebooks:
+            self.engine.query.init_character(
+                self.name,
+                **d
+            )
         for rulebook in (
                 'character', 'avatar', 'character_thing',
                 'character_place', 'character_node', 'character_portal'
@@ -1256,12 +1300,12 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
         def __getitem__(self, thing):
             if thing not in self:
                 raise KeyError("No such thing: {}".format(thing))
+            key = (self.character.name, thing)
             cache = self.engine._node_objs
-            if (self.name, thing) not in cache or not isinstance(
-                    cache[(self.name, thing)], Thing
-            ):
-                cache[(self.name, thing)] = Thing(self.character, thing)
-            return cache[(self.name, thing)]
+            ret = cache.get(key)
+            if not isinstance(ret, Thing):
+                ret = cache[key] = Thing(self.character, thing)
+            return ret
 
         def __setitem__(self, thing, val):
             if not isinstance(val, Mapping):
@@ -1269,11 +1313,12 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
             if 'location' not in val:
                 raise ValueError('Thing needs location')
             self.engine._exist_node(self.character.name, thing)
+            (branch, tick) = self.engine.time
             self.engine._things_cache.store(
                 self.character.name,
                 thing,
-                self.engine.branch,
-                self.engine.tick,
+                branch,
+                tick,
                 val['location'],
                 val.get('next_location', None)
             )
@@ -1290,8 +1335,7 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
                 th = cache[(self.name, thing)]
             else:
                 th = cache[(self.name, thing)] = Thing(self.character, thing)
-            th.clear()
-            th.update(val)
+            th.replace(val)
             self.send(self, key=thing, val=th)
 
         def __delitem__(self, thing):
@@ -1299,11 +1343,12 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
             cache = self.engine._node_objs
             if (self.name, thing) in cache:
                 del cache[(self.name, thing)]
+            (branch, tick) = self.engine.time
             self.engine._things_cache.store(
                 self.character.name,
                 self.name,
-                self.engine.branch,
-                self.engine.tick,
+                branch,
+                tick,
                 None
             )
             self.send(self, key=thing, val=None)
@@ -1324,41 +1369,47 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
             self.character = character
 
         def __iter__(self):
+            (branch, tick) = self.engine.time
+            # One copy of the things' names, so each node costs a set
+            # lookup and not a trip through the things cache
+            things = set(self.engine._things_cache.iter_entities(
+                self.character.name, branch, tick
+            ))
             for node in self.engine._nodes_cache.iter_entities(
-                    self.character.name, *self.engine.time
+                    self.character.name, branch, tick
             ):
-                if not self.engine._things_cache.contains_entity(
-                        self.character.name, node, *self.engine.time
-                ):
+                if node not in things:
                     yield node
 
         def __len__(self):
+            (branch, tick) = self.engine.time
             return self.engine._nodes_cache.count_entities(
-                self.character.name, *self.engine.time
+                self.character.name, branch, tick
             ) - self.engine._things_cache.count_entities(
-                self.character.name, *self.engine.time
+                self.character.name, branch, tick
             )
 
         def __contains__(self, place):
             # TODO: maybe a special cache just for places and not just
             # nodes in general
+            (branch, tick) = self.engine.time
             return (
                 self.engine._nodes_cache.contains_entity(
-                    self.character.name, place, *self.engine.time
+                    self.character.name, place, branch, tick
                 ) and not self.engine._things_cache.contains_entity(
-                    self.character.name, place, *self.engine.time
+                    self.character.name, place, branch, tick
                 )
             )
 
         def __getitem__(self, place):
             if place not in self:
                 raise KeyError("No such place: {}".format(place))
+            key = (self.character.name, place)
             cache = self.engine._node_objs
-            if (self.name, place) not in cache or not isinstance(
-                    cache[(self.name, place)], Place
-            ):
-                cache[(self.name, place)] = Place(self.character, place)
-            return cache[(self.name, place)]
+            ret = cache.get(key)
+            if not isinstance(ret, Place):
+                ret = cache[key] = Place(self.character, place)
+            return ret
 
         def __setitem__(self, place, v):
             cache = self.engine._node_objs
@@ -1369,13 +1420,12 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
             if not self.engine._node_exists(self.character.name, place):
                 self.engine._exist_node(self.character.name, place)
             pl = cache[(self.name, place)]
-            pl.clear()
-            pl.update(v)
+            pl.replace(v)
             self.send(self, key=place, val=v)
 
         def __delitem__(self, place):
+            # Node.delete records the node's nonexistence itself
             self[place].delete(nochar=True)
-            self.engine._exist_node(self.character.name, place, exist=False)
             del self.engine._node_objs[(self.name, place)]
             self.send(self, key=place, val=None)
 
@@ -1398,22 +1448,27 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
             return self.engine._node_exists(self.character.name, k)
 
         def __getitem__(self, k):
-            if k not in self:
+            engine = self.engine
+            charn = self.character.name
+            if not engine._node_exists(charn, k):
                 raise KeyError()
-            cache = self.engine._node_objs
-            if (self.name, k) not in cache:
-                if self.engine._is_thing(self.character.name, k):
-                    cache[(self.name, k)] = Thing(self.character, k)
+            key = (charn, k)
+            cache = engine._node_objs
+            try:
+                return cache[key]
+            except KeyError:
+                if engine._is_thing(charn, k):
+                    ret = cache[key] = Thing(self.character, k)
                 else:
-                    cache[(self.name, k)] = Place(self.character, k)
-            return cache[(self.name, k)]
+                    ret = cache[key] = Place(self.character, k)
+                return ret
 
         def __setitem__(self, k, v):
             self.character.place[k] = v
 
         def __delitem__(self, k):
-            if k not in self:
-                raise KeyError
+            # No need to check that k exists first. Things are nodes,
+            # and the place mapping raises KeyError for anything else
             if self.engine._is_thing(
                 self.character.name, k
             ):
@@ -1455,6 +1510,22 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
             super().__delitem__(nodeA)
             self.send(self, key=nodeA, val=None)
 
+        def iter_flat(self):
+            """Iterate over all my portals, without making a Successors
+            mapping for each origin.
+
+            """
+            engine = self.engine
+            charn = self.graph.name
+            (branch, tick) = engine.time
+            iter_successors = engine._edges_cache.iter_successors
+            get_portal = engine._get_portal
+            for orig in engine._nodes_cache.iter_entities(
+                    charn, branch, tick
+            ):
+                for dest in iter_successors(charn, orig, branch, tick):
+                    yield get_portal(charn, orig, dest)
+
         class Successors(GraphSuccessorsMapping.Successors):
             """Mapping for possible destinations from some node."""
 
@@ -1471,13 +1542,10 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
                 self.container.send(self, **kwargs)
 
             def __getitem__(self, nodeB):
-                key = (self.graph.name, self.nodeA, nodeB)
                 if nodeB in self:
-                    if key not in self.engine._portal_objs:
-                        self.engine._portal_objs[key] = Portal(
-                            self.graph, self.nodeA, nodeB
-                        )
-                    return self.engine._portal_objs[key]
+                    return self.engine._get_portal(
+                        self.graph.name, self.nodeA, nodeB
+                    )
                 raise KeyError("No such portal: {}->{}".format(
                     self.nodeA, nodeB
                 ))
@@ -1488,14 +1556,10 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
                     self.nodeA,
                     nodeB
                 )
-                key = (self.graph.name, self.nodeA, nodeB)
-                if key not in self.engine._portal_objs:
-                    self.engine._portal_objs[key] = Portal(
-                        self.graph, self.nodeA, nodeB
-                    )
-                p = self.engine._portal_objs[key]
-                p.clear()
-                p.update(value)
+                p = self.engine._get_portal(
+                    self.graph.name, self.nodeA, nodeB
+                )
+                p.replace(value)
                 self.send(self, key=nodeB, val=p)
 
             def __delitem__(self, nodeB):
@@ -1529,16 +1593,10 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
         class Predecessors(DiGraphPredecessorsMapping.Predecessors):
             """Mapping of possible origins from some destination."""
             def __setitem__(self, nodeA, value):
-                key = (self.graph.name, nodeA, self.nodeB)
-                if key not in self.engine._portal_objs:
-                    self.engine._portal_objs[key] = Portal(
-                        self.graph,
-                        nodeA,
-                        self.nodeB
-                    )
-                p = self.engine._portal_objs[key]
-                p.clear()
-                p.update(value)
+                p = self.engine._get_portal(
+                    self.graph.name, nodeA, self.nodeB
+                )
+                p.replace(value)
                 p.engine._exist_edge(self.graph.name, self.nodeB, nodeA)
 
     class AvatarGraphMapping(Mapping, RuleFollower):
@@ -1578,6 +1636,8 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
             ))
 
         def __contains__(self, k):
+            if self.character.name not in self.engine._avatarness_cache.graphs:
+                return False
             return k in self.engine._avatarness_cache.get_char_graphs(
                 self.character.name, *self.engine.time
             )
@@ -1588,6 +1648,19 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
                 self.character.name, *self.engine.time
             ))
 
+        def __bool__(self):
+            """Whether I have an avatar in any graph, presently.
+
+            Characters that never had an avatar are answered without
+            looking up the time.
+
+            """
+            if self.character.name not in self.engine._avatarness_cache.graphs:
+                return False
+            return bool(self.engine._avatarness_cache.get_char_graphs(
+                self.character.name, *self.engine.time
+            ))
+
         def _get_char_av_cache(self, g):
             if g not in self:
                 raise KeyError
@@ -1678,15 +1751,20 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
                     return self.engine._node_objs[(self.graph, av)]
                 raise KeyError("No avatar: {}".format(av))
 
+            def _get_solo_av(self):
+                return self.engine._avatarness_cache.get_char_graph_solo_av(
+                    self.name, self.graph, *self.engine.time
+                )
+
             @property
             def only(self):
-                mykey = singleton_get(self.keys())
+                mykey = self._get_solo_av()
                 if mykey is None:
                     raise AttributeError("No avatar, or more than one")
                 return self.engine._node_objs[(self.graph, mykey)]
 
             def __setitem__(self, k, v):
-                mykey = singleton_get(self.keys())
+                mykey = self._get_solo_av()
                 if mykey is None:
                     raise AmbiguousAvatarError(
                         "More than one avatar in {}; "
@@ -1780,12 +1858,30 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
         self.place2thing(name, location)
 
     def add_things_from(self, seq):
+        """Take a series of ``(name, location)`` tuples and make a Thing of
+        each.
+
+        The tuples may also have a next location and a dictionary of
+        stats. All the locations are written in a single batch.
+
+        """
+        rows = []
         for tup in seq:
             name = tup[0]
             location = tup[1]
             next_loc = tup[2] if len(tup) > 2 else None
             kwargs = tup[3] if len(tup) > 3 else {}
-            self.add_thing(name, location, next_loc, **kwargs)
+            if name in self.thing:
+                raise WorldIntegrityError(
+                    "Already have a Thing named {}".format(name)
+                )
+            super().add_node(name, **kwargs)
+            if isinstance(location, Node):
+                location = location.name
+            if isinstance(next_loc, Node):
+                next_loc = next_loc.name
+            rows.append((name, location, next_loc))
+        self.engine._set_things_loc_and_next(self.name, rows)
 
     def new_thing(
             self, name, location, statdict={}, **kwargs
@@ -1842,7 +1938,7 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
         if isinstance(destination, Node):
             destination = destination.name
         self.add_portal(origin, destination, symmetrical, **kwargs)
-        return self.engine._portal_objs[(self.name, origin, destination)]
+        return self.engine._get_portal(self.name, origin, destination)
 
     def add_portals_from(self, seq, symmetrical=False):
         """Take a sequence of (origin, destination) pairs and make a
@@ -1930,23 +2026,17 @@ class Character(AbstractCharacter, DiGraph, RuleFollower):
 
     def portals(self):
         """Iterate over all portals."""
-        for (o, d) in self.engine._edges_cache.iter_keys(
-                self.character.name, *self.engine.time
-        ):
-            yield self.engine._portal_objs[(self.character.name, o, d)]
+        yield from self.portal.iter_flat()
 
     def avatars(self):
         """Iterate over all my avatars, regardless of what character they are
         in.
 
         """
-        for graph in self.engine._avatarness_cache.iter_entities(
-                self.character.name, *self.engine.time
+        engine = self.engine
+        node_objs = engine._node_objs
+        for av in engine._avatarness_cache.get_char_avs(
+                self.character.name, *engine.time
         ):
-            for node in self.engine._avatarness_cache.iter_entities(
-                    self.character.name, graph, *self.engine.time
-            ):
-                try:
-                    yield self.engine._node_objs[(graph, node)]
-                except KeyError:
-                    continue
+            if av in node_objs:
+                yield node_objs[av]
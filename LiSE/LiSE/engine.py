@@ -6,6 +6,7 @@ flow of time.
 
 """
 from random import Random
+from sys import intern
 from functools import partial
 from json import dumps, loads, JSONEncoder
 from blinker import Signal
@@ -75,13 +76,16 @@ class TimeSignalDescriptor(object):
         if id(inst) not in self.signals:
             self.signals[id(inst)] = TimeSignal(inst)
         real = self.signals[id(inst)]
-        (branch_then, tick_then) = real.engine.time
+        engine = real.engine
+        (branch_then, tick_then) = (engine.branch, engine.tick)
         (branch_now, tick_now) = val
+        if (branch_now, tick_now) == (branch_then, tick_then):
+            return
         # make sure I'll end up within the revision range of the
         # destination branch
         if branch_now != 'trunk':
-            if branch_now in real.engine._parentbranch_rev:
-                parrev = real.engine._parentbranch_rev[branch_now][1]
+            if branch_now in engine._parentbranch_rev:
+                parrev = engine._parentbranch_rev[branch_now][1]
                 if tick_now < parrev:
                     raise ValueError(
                         "Tried to jump to branch {br}, "
@@ -92,19 +96,23 @@ class TimeSignalDescriptor(object):
                         )
                     )
             else:
-                real.engine._parentbranch_rev[branch_now] = (
+                engine._parentbranch_rev[branch_now] = (
                     branch_then, tick_now
                 )
-                real.engine.query.new_branch(branch_now, branch_then, tick_now)
-        (real.engine._obranch, real.engine._orev) = val
-        real.send(
-            real,
-            engine=real.engine,
-            branch_then=branch_then,
-            tick_then=tick_then,
-            branch_now=branch_now,
-            tick_now=tick_now
-        )
+                engine._childbranch[branch_then].add(branch_now)
+                engine.query.new_branch(branch_now, branch_then, tick_now)
+        # write the cursor directly, so the branch and tick setters
+        # don't each send their own signal
+        (engine._obranch, engine._orev) = val
+        if real.receivers:
+            real.send(
+                real,
+                engine=engine,
+                branch_then=branch_then,
+                tick_then=tick_then,
+                branch_now=branch_now,
+                tick_now=tick_now
+            )
 
 
 class NextTick(Signal):
@@ -123,16 +131,18 @@ class NextTick(Signal):
         self.engine = engine
 
     def __call__(self):
-        curtick = self.engine.tick
+        engine = self.engine
+        advance = engine.advance
+        curtick = engine.tick
         r = []
-        while self.engine.tick == curtick:
-            r.append(self.engine.advance())
+        while engine.tick == curtick:
+            r.append(advance())
         # The last element is always None, but is not a sentinel; any
         # rule may return None.
         self.send(
-            self.engine,
-            branch=self.engine.branch,
-            tick=self.engine.tick,
+            engine,
+            branch=engine.branch,
+            tick=engine.tick,
             result=r
         )
         return r[:-1]
@@ -147,6 +157,10 @@ class DummyEntity(dict):
 
 json_dump_hints = {}
 json_load_hints = {}
+# Roll at least this many dice at once with Random.choices, which is
+# quicker per die than randint, but draws different numbers from the
+# same seed.
+many_dice = 64
 
 
 class Encoder(JSONEncoder):
@@ -212,11 +226,11 @@ class AbstractEngine(object):
             'place': nodeget,
             'thing': nodeget,
             'node': nodeget,
-            'portal': lambda obj: self._portal_objs[(
+            'portal': lambda obj: self._get_portal(
                 self.delistify(obj[1]),
                 self.delistify(obj[2]),
                 self.delistify(obj[3])
-            )]
+            )
         }
 
     def delistify(self, obj):
@@ -247,7 +261,14 @@ class AbstractEngine(object):
         global json_dump_hints, json_load_hints
         if s in json_load_hints:
             return json_load_hints[s]
-        return self.delistify(loads(s))
+        ret = self.delistify(loads(s))
+        if isinstance(ret, str):
+            # Names of characters, nodes and so on come through here,
+            # and they end up as keys in a lot of caches. One interned
+            # copy of each compares by identity. Interning doesn't need
+            # a memo, so don't grow json_load_hints with every string.
+            ret = intern(ret)
+        return ret
 
 
 class Engine(AbstractEngine, gORM):
@@ -384,6 +405,12 @@ class Engine(AbstractEngine, gORM):
         """
         branch = self.branch if branch is None else branch
         tick = self.tick if tick is None else tick
+        # names loaded from the database are interned; intern these
+        # too, so the avatarness cache's keys are all the same objects
+        (character, graph, node) = (
+            intern(name) if isinstance(name, str) else name
+            for name in (character, graph, node)
+        )
         self._avatarness_cache.store(
             character,
             graph,
@@ -453,8 +480,13 @@ class Engine(AbstractEngine, gORM):
         for row in self.query.things_dump():
             self._things_cache.store(*row)
         super()._init_load()
-        for row in self.rule.query.universal_dump():
+        for row in self.query.universal_dump():
             self._universal_cache.store(*row)
+        for store in (
+                self.action, self.prereq, self.trigger,
+                self.function, self.method
+        ):
+            store._load()
         for row in self.rule.query.rulebooks_rules():
             self._rulebooks_cache.store(*row)
         for row in self.rule.query.characters_rulebooks():
@@ -487,7 +519,9 @@ class Engine(AbstractEngine, gORM):
 
     def _load_graphs(self):
         for charn in self.query.characters():
-            self._graph_objs[charn] = Character(self, charn)
+            self._graph_objs[charn] = Character(
+                self, charn, init_rulebooks=False
+            )
 
     def __init__(
             self,
@@ -590,7 +624,7 @@ class Engine(AbstractEngine, gORM):
 
     def coinflip(self):
         """Return True or False with equal probability."""
-        return self.choice((True, False))
+        return bool(self.rando.getrandbits(1))
 
     def roll_die(self, d):
         """Roll a die with ``d`` faces. Return the result."""
@@ -603,6 +637,9 @@ class Engine(AbstractEngine, gORM):
         successon.
 
         """
+        if n >= many_dice:
+            yield from self.rando.choices(range(1, d + 1), k=n)
+            return
         for i in range(0, n):
             yield self.roll_die(d)
 
@@ -628,7 +665,7 @@ class Engine(AbstractEngine, gORM):
             return False
         if pct >= 100:
             return True
-        return pct / 100 < self.random()
+        return self.rando.random() * 100 < pct
 
     def commit(self):
         """Commit to both the world and code databases, and begin a new
@@ -661,13 +698,13 @@ class Engine(AbstractEngine, gORM):
     @branch.setter
     def branch(self, v):
         """Set my allegedb's branch and call listeners"""
-        (b, t) = self.time
+        (b, t) = (self.branch, self.tick)
         if v == b:
             return
         if v != 'trunk':
             if v in self._parentbranch_rev:
                 partick = self._parentbranch_rev[v][1]
-                if self.tick < partick:
+                if t < partick:
                     raise ValueError(
                         "Tried to jump to branch {br}, "
                         "which starts at tick {rv}. "
@@ -683,8 +720,9 @@ class Engine(AbstractEngine, gORM):
                 self._childbranch[parent].add(child)
                 self.query.new_branch(child, parent, t)
         self._obranch = v
-        if not hasattr(self, 'locktime'):
-            self.time.send(
+        time = self.time
+        if time.receivers and not hasattr(self, 'locktime'):
+            time.send(
                 self,
                 branch_then=b,
                 tick_then=t,
@@ -701,12 +739,13 @@ class Engine(AbstractEngine, gORM):
         """Update allegedb's ``rev``, and call listeners"""
         if not isinstance(v, int):
             raise TypeError("tick must be integer")
-        (branch_then, tick_then) = self.time
-        if v == self.tick:
+        (branch_then, tick_then) = (self.branch, self.tick)
+        if v == tick_then:
             return
         self.rev = v
-        if not hasattr(self, 'locktime'):
-            self.time.send(
+        time = self.time
+        if time.receivers and not hasattr(self, 'locktime'):
+            time.send(
                 self,
                 branch_then=branch_then,
                 tick_then=tick_then,
@@ -777,9 +816,10 @@ class Engine(AbstractEngine, gORM):
                             chara.name, nodeA, nodeB, rulebook, *self.time
                     ):
                         yield (
-                            chara,
+                            chara.name,
                             nodeA,
                             nodeB,
+                            0,
                             rulebook,
                             rule
                         )
@@ -795,16 +835,34 @@ class Engine(AbstractEngine, gORM):
         to. For character-wide rules it is ``None``.
 
         """
+        # Most rows are about a handful of characters and rules, so
+        # look each one up only once. Checking that a rule exists
+        # takes a query.
+        charmap = self.character
+        chars = {}
+        allrules = self.rule
+        rules = {}
+
+        def get_char(name):
+            if name not in chars:
+                chars[name] = charmap[name]
+            return chars[name]
+
+        def get_rule(name):
+            if name not in rules:
+                rules[name] = allrules[name]
+            return rules[name]
+
         for (
                 rulemap, character, rulebook, rule
         ) in self._poll_char_rules():
             try:
                 yield (
                     rulemap,
-                    self.character[character],
+                    get_char(character),
                     None,
                     rulebook,
-                    self.rule[rule]
+                    get_rule(rule)
                 )
             except KeyError:
                 continue
@@ -812,18 +870,18 @@ class Engine(AbstractEngine, gORM):
                 character, node, rulebook, rule
         ) in self._poll_node_rules():
             try:
-                c = self.character[character]
+                c = get_char(character)
                 n = c.node[node]
             except KeyError:
                 continue
             typ = 'thing' if hasattr(n, 'location') else 'place'
-            yield typ, c, n, rulebook, self.rule[rule]
+            yield typ, c, n, rulebook, get_rule(rule)
         for (
                 character, a, b, i, rulebook, rule
         ) in self._poll_portal_rules():
             try:
-                c = self.character[character]
-                yield 'portal', c, c.portal[a][b], rulebook, self.rule[rule]
+                c = get_char(character)
+                yield 'portal', c, c.portal[a][b], rulebook, get_rule(rule)
             except KeyError:
                 continue
 
@@ -925,7 +983,7 @@ class Engine(AbstractEngine, gORM):
                     for node in character.node.values():
                         yield follow(character, node)
                 elif typ == 'character_portal':
-                    for portal in character.portal.values():
+                    for portal in character.portals():
                         yield follow(character, portal)
                 else:
                     raise ValueError('Unknown type of rule')
@@ -938,10 +996,10 @@ class Engine(AbstractEngine, gORM):
         try:
             r = next(self._rules_iter)
         except StopIteration:
-            self.tick += 1
+            tick = self.tick = self.tick + 1
             self._rules_iter = self._follow_rules()
             self.universal['rando_state'] = self.rando.getstate()
-            if self.commit_modulus and self.tick % self.commit_modulus == 0:
+            if self.commit_modulus and tick % self.commit_modulus == 0:
                 self.commit()
             r = None
         return r
@@ -994,8 +1052,38 @@ class Engine(AbstractEngine, gORM):
         )
         self._things_cache.store(character, node, branch, tick, loc, nextloc)
 
+    def _set_things_loc_and_next(self, character, rows):
+        """Set ``(thing, loc, nextloc)`` for each of ``rows`` now."""
+        (branch, tick) = self.time
+        self.query.things_loc_and_next_set(character, branch, tick, rows)
+        for (thing, loc, nextloc) in rows:
+            self._things_cache.store(
+                character, thing, branch, tick, loc, nextloc
+            )
+
     def _node_exists(self, character, node):
-        return self._nodes_cache.contains_entity(character, node, *self.time)
+        # Unpacking self.time would go through its descriptor and a
+        # generator, which costs as much as the lookup itself.
+        return self._nodes_cache.contains_entity(
+            character, node, self.branch, self.tick
+        )
+
+    def _get_portal(self, character, orig, dest):
+        """Return the one :class:`Portal` object for this edge.
+
+        The edges cache makes one for each edge it stores, so use that
+        if it's there.
+
+        """
+        key = (character, orig, dest)
+        try:
+            return self._portal_objs[key]
+        except KeyError:
+            ret = self._edge_objs.get(key + (0,))
+            if ret is None:
+                ret = Portal(self.character[character], orig, dest)
+            self._portal_objs[key] = ret
+            return ret
 
     def _exist_node(self, character, node, exist=True, branch=None, tick=None):
         branch = branch or self.branch
@@ -17,6 +17,14 @@ from .util import dict_diff, set_diff
 from allegedb.cache import HistoryError
 
 
+def defaultdict_set():
+    return defaultdict(set)
+
+
+def defaultdict_dict():
+    return defaultdict(dict)
+
+
 def branching(fun):
     def brancher(self, *args, **kwargs):
         try:
@@ -52,16 +60,12 @@ class EngineHandle(object):
         self.branch = self._real.branch
         self.tick = self._real.tick
         self._node_stat_cache = defaultdict(dict)
-        self._portal_stat_cache = defaultdict(
-            lambda: defaultdict(dict)
-        )
+        self._portal_stat_cache = defaultdict(defaultdict_dict)
         self._char_stat_cache = {}
-        self._char_av_cache = defaultdict(lambda: defaultdict(set))
+        self._char_av_cache = defaultdict(defaultdict_set)
         self._char_rulebooks_cache = {}
         self._char_nodes_rulebooks_cache = defaultdict(dict)
-        self._char_portals_rulebooks_cache = defaultdict(
-            lambda: defaultdict(dict)
-        )
+        self._char_portals_rulebooks_cache = defaultdict(defaultdict_dict)
         self._char_things_cache = {}
         self._char_places_cache = {}
         self._char_portals_cache = {}
@@ -72,6 +76,26 @@ class EngineHandle(object):
         self._rule_cache = {}
         self._rulebook_cache = defaultdict(list)
         self._stores_cache = defaultdict(dict)
+        self._cmd_dispatch = {
+            name: getattr(self, name) for name in (
+                'next_tick', 'time_travel', 'get_chardiffs',
+                'add_character', 'del_character', 'del_node',
+                'del_portal', 'commit', 'close'
+            )
+        }
+
+    def get_command(self, cmd):
+        """Return the bound method for the command named ``cmd``.
+
+        Methods are looked up once and kept in a dispatch table, so
+        the command loop doesn't have to ``getattr`` for every message.
+
+        """
+        try:
+            return self._cmd_dispatch[cmd]
+        except KeyError:
+            method = self._cmd_dispatch[cmd] = getattr(self, cmd)
+            return method
 
     def log(self, level, message):
         if self._logq and level >= self._loglevel:
@@ -139,6 +163,12 @@ class EngineHandle(object):
     def time_locked(self):
         return hasattr(self._real, 'locktime')
 
+    def batch(self, ops):
+        """Run several silent commands sent together."""
+        get_command = self.get_command
+        for op in ops:
+            get_command(op.pop('command'))(**op)
+
     def advance(self):
         self._real.advance()
 
@@ -154,6 +184,18 @@ class EngineHandle(object):
                 for char in chars
             }
 
+    def stream_chardiffs(self, chars):
+        """Generate ``(char, chardiff)`` pairs one character at a time.
+
+        The command loop sends each pair as its own message, so the
+        other end can apply them while the rest are still being made.
+
+        """
+        if chars == 'all':
+            chars = list(self._real.character.keys())
+        for char in chars:
+            yield char, self.character_diff(char)
+
     def next_tick(self, chars=[]):
         self._real.next_tick()
         self.tick += 1
@@ -476,12 +518,12 @@ class EngineHandle(object):
     @branching
     def set_node_stat(self, char, node, k, v):
         self._real.character[char].node[node][k] = v
-        self._node_stat_cache.setdefault(char, {})[node][k] = v
+        self._node_stat_cache[char].setdefault(node, {})[k] = v
 
     @branching
     def del_node_stat(self, char, node, k):
         del self._real.character[char].node[node][k]
-        del self._node_stat_cache[char][node][k]
+        self._node_stat_cache[char].get(node, {}).pop(k, None)
 
     def node_stat_copy(self, node_or_char, node=None):
         """Return a node's stats, prepared for pickling, in a dictionary."""
@@ -681,7 +723,7 @@ class EngineHandle(object):
     @branching
     def set_thing(self, char, thing, statdict):
         self._real.character[char].thing[thing] = statdict
-        self._node_stat_cache.setdefault(char, {})[thing] = statdict
+        self._node_stat_cache[char][thing] = statdict
         loc = statdict.pop('location')
         nxtloc = statdict.pop('next_location', None)
         arrt = statdict.pop('arrival_time', self.tick)
@@ -693,7 +735,7 @@ class EngineHandle(object):
         self._real.character[char].add_thing(
             thing, loc, next_loc, **statdict
         )
-        self._node_stat_cache.setdefault(char, {})[thing] = statdict
+        self._node_stat_cache[char][thing] = statdict
         self._char_things_cache.setdefault(char, {})[thing] = (loc, next_loc, self.tick, None)
 
     @branching
@@ -766,7 +808,7 @@ class EngineHandle(object):
     @branching
     def set_place(self, char, place, statdict):
         self._real.character[char].place[place] = statdict
-        self._node_stat_cache.setdefault(char, {})[place] = statdict
+        self._node_stat_cache[char][place] = statdict
 
     def add_places_from(self, char, seq):
         # TODO: special case of branching
@@ -787,7 +829,7 @@ class EngineHandle(object):
     @branching
     def set_portal(self, char, orig, dest, statdict):
         self._real.character[char].portal[orig][dest] = statdict
-        self._portal_stat_cache.setdefault(char, {})[orig][dest] = statdict
+        self._portal_stat_cache[char][orig][dest] = statdict
 
     def character_portals(self, char):
         r = []
@@ -825,12 +867,12 @@ class EngineHandle(object):
     @branching
     def set_portal_stat(self, char, orig, dest, k, v):
         self._real.character[char].portal[orig][dest][k] = v
-        self._portal_stat_cache.setdefault(char, {}).setdefault(orig, {})[dest][k] = v
+        self._portal_stat_cache[char][orig].setdefault(dest, {})[k] = v
 
     @branching
     def del_portal_stat(self, char, orig, dest, k):
         del self._real.character[char][orig][dest][k]
-        del self._portal_stat_cache[char][orig][dest][k]
+        self._portal_stat_cache[char][orig].get(dest, {}).pop(k, None)
 
     def portal_stat_copy(self, char, orig, dest):
         return {
@@ -878,12 +920,12 @@ class EngineHandle(object):
     @branching
     def add_avatar(self, char, graph, node):
         self._real.character[char].add_avatar(graph, node)
-        self._char_av_cache.setdefault(char, {})[graph].add(node)
+        self._char_av_cache[char][graph].add(node)
 
     @branching
     def del_avatar(self, char, graph, node):
         self._real.character[char].del_avatar(graph, node)
-        self._char_av_cache.setdefault(char, {})[graph].remove(node)
+        self._char_av_cache[char][graph].remove(node)
 
     def new_empty_rule(self, rule):
         self._real.rule.new_empty(rule)
@@ -11,8 +11,9 @@ from collections import Mapping
 from networkx import shortest_path, shortest_path_length
 
 import allegedb.graph
+from allegedb.cache import HistoryError
 
-from .util import getatt
+from .util import getatt, singleton_get
 from .query import StatusAlias
 from . import rule
 
@@ -59,16 +60,22 @@ class UserMapping(Mapping):
         yield from self.node._user_names()
 
     def __len__(self):
-        n = 0
-        for user in self.node._user_names():
-            n += 1
-        return n
+        return sum(1 for _ in self.node._user_names())
+
+    def _only_user(self):
+        """Return my only user, or ``None`` if I have more or fewer.
+
+        Stops looking at the second user, rather than counting them all.
+
+        """
+        name = singleton_get(self.node._user_names())
+        if name is not None:
+            return self.engine.character[name]
 
     def __getitem__(self, k):
-        if len(self) == 1:
-            me = self.engine.character[next(self.node._user_names())]
-            if k in me:
-                return me[k]
+        me = self._only_user()
+        if me is not None and k in me:
+            return me[k]
         if k not in self.node._user_names():
             raise KeyError("{} not used by {}".format(
                 self.node.name, k
@@ -76,19 +83,18 @@ class UserMapping(Mapping):
         return self.engine.character[k]
 
     def __setitem__(self, k, v):
-        if len(self) != 1:
+        me = self._only_user()
+        if me is None:
             raise KeyError(
                 "More than one user. "
                 "Look up the one you want to set a stat on."
             )
-        me = self.engine.character[next(self.node._user_names())]
         me[k] = v
 
     def __getattr__(self, attr):
-        if len(self) == 1:
-            me = self.engine.character[next(self.node._user_names())]
-            if hasattr(me, attr):
-                return getattr(me, attr)
+        me = self._only_user()
+        if me is not None and hasattr(me, attr):
+            return getattr(me, attr)
 
 
 class Node(allegedb.graph.Node, rule.RuleFollower):
@@ -131,15 +137,17 @@ class Node(allegedb.graph.Node, rule.RuleFollower):
            self.name not in cache[self.character.name]:
             return
         cache = cache[self.character.name][self.name]
-        seen = set()
-        for user in cache:
-            if user in seen:
-                continue
-            for (branch, tick) in self.engine._active_branches():
-                if branch in cache[user]:
-                    if cache[user][branch][tick]:
-                        yield user
-                    seen.add(user)
+        active_branches = list(self.engine._active_branches())
+        for (user, branches) in cache.items():
+            for (branch, tick) in active_branches:
+                if branch in branches:
+                    # stored False as None, so a HistoryError here
+                    # means this is not, or not yet, an avatar
+                    try:
+                        if branches[branch][tick]:
+                            yield user
+                    except HistoryError:
+                        pass
                     break
 
     @property
@@ -174,6 +182,13 @@ class Node(allegedb.graph.Node, rule.RuleFollower):
         for key in super().__iter__():
             del self[key]
 
+    def replace(self, other):
+        """Make my stats match ``other``'s, leaving equal ones alone."""
+        for key in list(super().__iter__()):
+            if key not in other:
+                del self[key]
+        self.update(other)
+
     def __contains__(self, k):
         """Handle extra keys, then delegate."""
         if k in self.extrakeys:
@@ -327,7 +342,7 @@ class Node(allegedb.graph.Node, rule.RuleFollower):
     def new_thing(self, name, statdict={}, **stats):
         """Create a new thing, located here, and return it."""
         return self.character.new_thing(
-            name, self.name, None, statdict, **stats
+            name, self.name, statdict, **stats
         )
 
     def historical(self, stat):
@@ -4,7 +4,6 @@
 
 from allegedb.graph import Edge
 
-from .exc import CacheError
 from .util import getatt
 from .query import StatusAlias
 from .rule import RuleFollower
@@ -66,21 +65,8 @@ class Portal(Edge, RuleFollower):
         ))
 
     def _get_rulebook_name(self):
-        cache = self.engine._portals_rulebooks_cache
-        if self.character.name not in cache or \
-            self._origin not in cache[self.character.name] or \
-            self._destination not in cache[
-                self.character.name][self._origin]:
-            return
-        cache = cache[self.character.name][self._origin][self._destination]
-        for (branch, tick) in self.engine._active_branches():
-            if branch in cache:
-                return cache[branch][tick]
-        raise CacheError(
-            "Rulebook for portal {}->{} in character {} is not cached.".format(
-                self._origin, self._destination, self.character.name
-            )
-        )
+        key = (self.character.name, self._origin, self._destination)
+        return self.engine._portals_rulebooks_cache.shallow.get(key, key)
 
     def _get_rule_mapping(self):
         return RuleMapping(self)
@@ -4,25 +4,32 @@
 import sys
 import logging
 from os import getpid
+from types import GeneratorType
+from contextlib import contextmanager
+from concurrent.futures import Future
 from collections import (
     Mapping,
     MutableMapping,
-    MutableSequence
+    MutableSequence,
+    OrderedDict
 )
-from threading import Thread, Lock
+from threading import Thread, Lock, local
 from multiprocessing import Process, Pipe, Queue, ProcessError
-from queue import Empty
+from queue import Empty, Queue as ThreadQueue
 from blinker import Signal
 
 from .engine import AbstractEngine
 from .character import Facade
 from allegedb.xjson import JSONReWrapper, JSONListReWrapper
-from .util import reify
 from allegedb.cache import PickyDefaultDict, StructuredDefaultDict
 from .handle import EngineHandle
 from .xcollections import AbstractLanguageDescriptor
 
 
+atomic_types = frozenset((str, int, float, bool, type(None)))
+"""Types that ``EngineProxy.json_rewrap`` can pass through untouched."""
+
+
 class CachingProxy(MutableMapping, Signal):
     def __init__(self, engine_proxy):
         super().__init__()
@@ -125,6 +132,7 @@ class RulebookProxyDescriptor(object):
 
 class NodeProxy(CachingEntityProxy):
     rulebook = RulebookProxyDescriptor()
+
     @property
     def character(self):
         return self.engine.character[self._charname]
@@ -620,8 +628,7 @@ class ThingMapProxy(CachingProxy):
                         thisthing._next_arrival_time = next_arrival_time
                         thisthing.send(thisthing, key='next_arrival_time', val=next_arrival_time)
                 else:
-                    self._cache[thing] = ThingProxy(
-                        self.engine,
+                    self._cache[thing] = self.engine._get_thing_proxy(
                         self.name,
                         thing,
                         location,
@@ -631,7 +638,7 @@ class ThingMapProxy(CachingProxy):
                     )
             elif thing in self._cache:
                 self.send(self, key=thing, val=None)
-                del self._cache[thing]
+                self.engine._recycle_thing(self._cache.pop(thing))
 
     def _get_diff(self):
         return self.engine.handle(
@@ -712,14 +719,13 @@ class PlaceMapProxy(CachingProxy):
         for (place, ex) in diff.items():
             if ex:
                 if place not in self._cache:
-                    self._cache[place] = PlaceProxy(
-                        self.engine,
+                    self._cache[place] = self.engine._get_place_proxy(
                         self.name,
                         place
                     )
             else:
                 if place in self._cache:
-                    del self._cache[place]
+                    self.engine._recycle_place(self._cache.pop(place))
 
     def _get_diff(self):
         return self.engine.handle(
@@ -1270,6 +1276,10 @@ class AvatarMapProxy(Mapping):
 
 
 class CharacterProxy(MutableMapping):
+    __slots__ = (
+        'engine', 'name', 'adj', 'succ', 'portal', 'pred', 'preportal',
+        'thing', 'place', 'node', 'stat', '_avatar', '__weakref__'
+    )
     rulebook = RulebookProxyDescriptor()
 
     def _get_default_rulebook_name(self):
@@ -1287,13 +1297,16 @@ class CharacterProxy(MutableMapping):
             char=self.name, rulebook=rb, silent=True
         )
 
-    @reify
+    @property
     def avatar(self):
-        return AvatarMapProxy(self)
+        if self._avatar is None:
+            self._avatar = AvatarMapProxy(self)
+        return self._avatar
 
     def __init__(self, engine_proxy, charname):
         self.engine = engine_proxy
         self.name = charname
+        self._avatar = None
         self.adj = self.succ = self.portal = CharSuccessorsMappingProxy(
             self.engine, self.name
         )
@@ -1793,6 +1806,8 @@ class EngineProxy(AbstractEngine):
     place_cls = PlaceProxy
     portal_cls = PortalProxy
     time = TimeDescriptor()
+    proxy_freelist_size = 4096
+    """How many deleted node proxies of each kind to keep for reuse."""
 
     @property
     def branch(self):
@@ -1819,6 +1834,12 @@ class EngineProxy(AbstractEngine):
         self._handle_in = handle_in
         self._handle_in_lock = Lock()
         self._handle_lock = Lock()
+        self._pipeline = local()
+        self._time_travel_jobs = ThreadQueue()
+        self._time_travel_thread = Thread(
+            target=self._time_travel_worker, daemon=True
+        )
+        self._time_travel_thread.start()
         self.logger = logger
         self.method = FuncStoreProxy(self, 'method')
         self.eternal = EternalVarProxy(self)
@@ -1855,6 +1876,8 @@ class EngineProxy(AbstractEngine):
         )
         self._character_portals_cache = PortalObjCache()
         self._character_avatars_cache = PickyDefaultDict(dict)
+        self._thing_freelist = OrderedDict()
+        self._place_freelist = OrderedDict()
 
         class LoudCharCache(dict):
             def __setitem__(self, key, val):
@@ -1909,6 +1932,46 @@ class EngineProxy(AbstractEngine):
                         char, orig, dest, PortalProxy(self, char, orig, dest)
                     )
 
+    def _recycle_proxy(self, freelist, proxy):
+        """Keep a deleted node proxy around so I can revive it later."""
+        proxy.exists = False
+        freelist[proxy._charname, proxy.name] = proxy
+        freelist.move_to_end((proxy._charname, proxy.name))
+        if len(freelist) > self.proxy_freelist_size:
+            freelist.popitem(last=False)
+
+    def _recycle_thing(self, thing):
+        self._recycle_proxy(self._thing_freelist, thing)
+
+    def _recycle_place(self, place):
+        self._recycle_proxy(self._place_freelist, place)
+
+    def _get_thing_proxy(
+            self, char, name, location, next_location,
+            arrival_time, next_arrival_time
+    ):
+        """Return a ThingProxy, reviving a deleted one if I have it."""
+        thing = self._thing_freelist.pop((char, name), None)
+        if thing is None:
+            return ThingProxy(
+                self, char, name, location, next_location,
+                arrival_time, next_arrival_time
+            )
+        thing._location = location
+        thing._next_location = next_location
+        thing._arrival_time = arrival_time
+        thing._next_arrival_time = next_arrival_time
+        thing.exists = True
+        return thing
+
+    def _get_place_proxy(self, char, name):
+        """Return a PlaceProxy, reviving a deleted one if I have it."""
+        place = self._place_freelist.pop((char, name), None)
+        if place is None:
+            return PlaceProxy(self, char, name)
+        place.exists = True
+        return place
+
     def delistify(self, obj):
         if not (isinstance(obj, list) or isinstance(obj, tuple)):
             return obj
@@ -1984,6 +2047,13 @@ class EngineProxy(AbstractEngine):
         else:
             raise TypeError("No command")
         branching = kwargs.pop('branching', False)
+        buffer = getattr(self._pipeline, 'buffer', None)
+        if buffer is not None:
+            if kwargs.get('silent'):
+                del kwargs['silent']
+                buffer.append(kwargs)
+                return
+            self._flush_pipeline()
         self._handle_lock.acquire()
         if 'silent' not in kwargs:
             kwargs['silent'] = False
@@ -2001,7 +2071,44 @@ class EngineProxy(AbstractEngine):
             return r
         self._handle_lock.release()
 
+    @contextmanager
+    def pipeline(self):
+        """Hold this thread's silent commands and send them all at once
+        when I exit.
+
+        Commands that return something are still sent right away, after
+        whatever's been held so far.
+
+        """
+        if getattr(self._pipeline, 'buffer', None) is not None:
+            yield
+            return
+        self._pipeline.buffer = []
+        try:
+            yield
+        finally:
+            ops = self._pipeline.buffer
+            self._pipeline.buffer = None
+            if ops:
+                self.handle(command='batch', ops=ops, silent=True)
+
+    def _flush_pipeline(self):
+        """Send the silent commands this thread's pipeline is holding, if
+        any, so they reach the engine before whatever I send next.
+
+        """
+        ops = getattr(self._pipeline, 'buffer', None)
+        if not ops:
+            return
+        self._pipeline.buffer = None
+        try:
+            self.handle(command='batch', ops=ops, silent=True)
+        finally:
+            self._pipeline.buffer = []
+
     def json_rewrap(self, r):
+        if type(r) in atomic_types:
+            return r
         if isinstance(r, tuple):
             if r[0] in ('JSONListReWrapper', 'JSONReWrapper'):
                 cls = JSONReWrapper if r[0] == 'JSONReWrapper' \
@@ -2018,7 +2125,8 @@ class EngineProxy(AbstractEngine):
                     try:
                         place = self.character[char].place[noden]
                     except KeyError:
-                        place = self._character_places_cache.setdefault(char, {})[noden] = PlaceProxy(self, char, noden)
+                        place = self._character_places_cache[char][noden] \
+                              = self._get_place_proxy(char, noden)
                     return cls(place, k, v)
                 elif r[1] == 'thing':
                     (char, thingn, loc, nxtloc, arrt, nxtarrt, k, v) = r[2:]
@@ -2026,9 +2134,10 @@ class EngineProxy(AbstractEngine):
                         thing = self._things_cache[char][thingn]
                     except (KeyError, TypeError):
                         # TypeError because StructuredDefaultDict can't instantiate ThingProxy
-                        thing = self._things_cache.setdefault(char, {})[thingn] = ThingProxy(
-                            self, char, thingn, loc, nxtloc, arrt, nxtarrt
-                        )
+                        thing = self._things_cache[char][thingn] \
+                              = self._get_thing_proxy(
+                                  char, thingn, loc, nxtloc, arrt, nxtarrt
+                              )
                     return cls(thing, k, v)
                 else:
                     assert (r[1] == 'portal')
@@ -2038,9 +2147,16 @@ class EngineProxy(AbstractEngine):
                 return tuple(self.json_rewrap(v) for v in r)
         elif isinstance(r, dict):
             # These can't have been stored in a stat
-            return {k: self.json_rewrap(v) for (k, v) in r.items()}
+            rewrap = self.json_rewrap
+            return {
+                k: v if type(v) in atomic_types else rewrap(v)
+                for (k, v) in r.items()
+            }
         elif isinstance(r, list):
-            return [self.json_rewrap(v) for v in r]
+            rewrap = self.json_rewrap
+            return [
+                v if type(v) in atomic_types else rewrap(v) for v in r
+            ]
         return r
 
     def json_load(self, s):
@@ -2052,17 +2168,48 @@ class EngineProxy(AbstractEngine):
             cb(received, **kwargs)
         return received
 
+    def _recv_stream(self, cmd):
+        """Generate the results of a streaming command as they arrive."""
+        while True:
+            command, result = self.recv()
+            assert cmd == command, \
+                "Sent command {} but received results for {}".format(
+                    cmd, command
+                )
+            if result is None:
+                return
+            yield self.json_load(result)
+
     def _upd_char_caches(self, chardiffs, **kwargs):
-        deleted = set(self.character.keys())
-        for (char, chardiff) in chardiffs.items():
-            if char not in self._char_cache:
-                self._char_cache[char] = CharacterProxy(self, char)
-            self.character[char]._apply_diff(chardiff)
-            deleted.discard(char)
-        if 'no_del' in kwargs:
-            return
+        """Apply diffs to my character proxies.
+
+        ``chardiffs`` may be a dict, or an iterable of ``(char, chardiff)``
+        pairs, which will be applied as they come.
+
+        """
+        char_cache = self._char_cache
+        if isinstance(chardiffs, dict):
+            for (char, chardiff) in chardiffs.items():
+                if char not in char_cache:
+                    char_cache[char] = CharacterProxy(self, char)
+                char_cache[char]._apply_diff(chardiff)
+            if 'no_del' in kwargs:
+                return
+            deleted = char_cache.keys() - chardiffs.keys()
+        else:
+            # streamed pairs can't be looked at again once they're
+            # applied, so keep track of which chars they were for
+            updated = set()
+            for (char, chardiff) in chardiffs:
+                if char not in char_cache:
+                    char_cache[char] = CharacterProxy(self, char)
+                char_cache[char]._apply_diff(chardiff)
+                updated.add(char)
+            if 'no_del' in kwargs:
+                return
+            deleted = char_cache.keys() - updated
         for char in deleted:
-            del self._char_cache[char]
+            del char_cache[char]
 
     def _inc_tick(self, *args):
         self._tick += 1
@@ -2088,11 +2235,28 @@ class EngineProxy(AbstractEngine):
 
     def pull(self, chars='all', cb=None, sync=True):
         """Update the state of all my proxy objects from the real objects."""
+        self._flush_pipeline()
         if sync:
-            diffs = self.handle('get_chardiffs', chars=chars)
-            self._upd_char_caches(diffs)
-            if cb:
-                cb(diffs)
+            self._handle_lock.acquire()
+            try:
+                self.send(self.json_dump({
+                    'silent': False,
+                    'command': 'stream_chardiffs',
+                    'chars': chars
+                }))
+                stream = self._recv_stream('stream_chardiffs')
+                try:
+                    if cb:
+                        diffs = dict(stream)
+                        self._upd_char_caches(diffs)
+                        cb(diffs)
+                    else:
+                        self._upd_char_caches(stream)
+                finally:
+                    for _ in stream:
+                        pass
+            finally:
+                self._handle_lock.release()
         else:
             Thread(
                 target=self._pull_async,
@@ -2105,6 +2269,7 @@ class EngineProxy(AbstractEngine):
         if not callable(cb):
             raise TypeError("Uncallable callback")
         if chars:
+            self._flush_pipeline()
             self.send(self.json_dump({
                 'silent': False,
                 'command': 'next_tick',
@@ -2127,6 +2292,21 @@ class EngineProxy(AbstractEngine):
             self.time.send(self, branch=ret['branch'], tick=ret['tick'])
             return ret
 
+    def _time_travel_worker(self):
+        while True:
+            job = self._time_travel_jobs.get()
+            if job is None:
+                return
+            (args, kwargs, done, block) = job
+            try:
+                done.set_result(self._call_with_recv(*args, **kwargs))
+            except Exception as ex:
+                # keep the worker alive for the next job; whoever's
+                # waiting on this one gets the exception instead
+                if not block:
+                    self.logger.exception("Error while time traveling")
+                done.set_exception(ex)
+
     def time_travel(self, branch, tick, chars='all', cb=None, block=True):
         if cb and not chars:
             raise TypeError("Callbacks require char name")
@@ -2136,12 +2316,12 @@ class EngineProxy(AbstractEngine):
             args = [self._set_time, self._upd_char_caches]
             if cb:
                 args.append(cb)
-            self._time_travel_thread = Thread(
-                target=self._call_with_recv,
-                args=args,
-                kwargs={'branch': branch, 'tick': tick, 'no_del': True}
+            self._flush_pipeline()
+            done = Future()
+            self._time_travel_jobs.put(
+                (args, {'branch': branch, 'tick': tick, 'no_del': True},
+                 done, block)
             )
-            self._time_travel_thread.start()
             self.send(self.json_dump({
                 'command': 'time_travel',
                 'silent': False,
@@ -2150,7 +2330,7 @@ class EngineProxy(AbstractEngine):
                 'chars': chars
             }))
             if block:
-                self._time_travel_thread.join()
+                done.result()
         else:
             self.handle(
                 command='time_travel',
@@ -2160,43 +2340,81 @@ class EngineProxy(AbstractEngine):
                 silent=True
             )
 
+    @staticmethod
+    def _split_character_data(data):
+        """Return the (places, things, portals) in new character data."""
+        return (
+            data.get('place', data.get('node', {})),
+            data.get('thing', {}),
+            data.get('edge', data.get('portal', data.get('adj', {})))
+        )
+
+    def validate_new_character(self, char, data={}):
+        """Assert that none of the data for a new character ``char`` is
+        cached yet.
+
+        ``add_character`` calls this, unless Python is running under
+        ``-O``.
+
+        """
+        (placedata, thingdata, portdata) = self._split_character_data(data)
+        assert char not in self._char_stat_cache
+        node_stat_cache = self._node_stat_cache.get(char, {})
+        places_cache = self._character_places_cache.get(char, {})
+        things_cache = self._things_cache.get(char, {})
+        assert placedata.keys().isdisjoint(places_cache)
+        assert placedata.keys().isdisjoint(node_stat_cache)
+        assert thingdata.keys().isdisjoint(things_cache)
+        assert thingdata.keys().isdisjoint(node_stat_cache)
+        assert portdata.keys().isdisjoint(
+            self._character_portals_cache.successors.get(char, {})
+        )
+        assert portdata.keys().isdisjoint(
+            self._portal_stat_cache.get(char, {})
+        )
+
     def add_character(self, char, data={}, **attr):
+        """Make a new character from ``data`` and stats in ``attr``."""
         if char in self._char_cache:
             raise KeyError("Character already exists")
-        assert char not in self._char_stat_cache
+        if __debug__:
+            self.validate_new_character(char, data)
+        (placedata, thingdata, portdata) = self._split_character_data(data)
         self._char_cache[char] = CharacterProxy(self, char)
         self._char_stat_cache[char] = attr
-        placedata = data.get('place', data.get('node', {}))
-        for place, stats in placedata.items():
-            assert place not in self._character_places_cache[char]
-            assert place not in self._node_stat_cache[char]
-            self._character_places_cache[char][place] \
-                = PlaceProxy(self.engine,  char,  place)
-            self._node_stat_cache[char][place] = stats
-        thingdata = data.get('thing',  {})
+        node_stat_cache = self._node_stat_cache[char]
+        self._character_places_cache[char].update(
+            (place, PlaceProxy(self, char, place)) for place in placedata
+        )
+        node_stat_cache.update(placedata)
+        things = {}
+        thingstats = {}
         for thing, stats in thingdata.items():
-            assert thing not in self._things_cache[char]
-            assert thing not in self._node_stat_cache[char]
             if 'location' not in stats:
                 raise ValueError('Things must always have locations')
             if 'arrival_time' in stats or 'next_arrival_time' in stats:
                 raise ValueError('The arrival_time stats are read-only')
-            loc = stats.pop('location')
-            nxtloc = stats.pop('next_location') \
-                     if 'next_location' in stats else None
-            self._things_cache[char][thing] \
-                = ThingProxy(loc, nxtloc, self.engine.rev, None)
-            self._node_stat_cache[char][thing] = stats
-        portdata = data.get('edge', data.get('portal', data.get('adj',  {})))
+            things[thing] = ThingProxy(
+                self, char, thing, stats['location'],
+                stats.get('next_location'), self.tick, None
+            )
+            thingstats[thing] = {
+                k: v for (k, v) in stats.items()
+                if k not in ('location', 'next_location')
+            }
+        self._things_cache[char].update(things)
+        node_stat_cache.update(thingstats)
+        successors = self._character_portals_cache.successors[char]
+        predecessors = self._character_portals_cache.predecessors[char]
+        portal_stat_cache = self._portal_stat_cache[char]
         for orig, dests in portdata.items():
-            assert orig not in self._character_portals_cache[char]
-            assert orig not in self._portal_stat_cache[char]
-            for dest, stats in dests.items():
-                assert dest not in self._character_portals_cache[char][orig]
-                assert dest not in self._portal_stat_cache[char][orig]
-                self._character_portals_cache[char][orig][dest] \
-                    = PortalProxy(self.engine, char, orig, dest)
-                self._portal_stat_cache[char][orig][dest] = stats
+            portals = {
+                dest: PortalProxy(self, char, orig, dest) for dest in dests
+            }
+            successors[orig].update(portals)
+            for dest, portal in portals.items():
+                predecessors[dest][orig] = portal
+            portal_stat_cache[orig].update(dests)
         self.handle(
             command='add_character', char=char, data=data, attr=attr,
             silent=True, branching=True
@@ -2223,9 +2441,9 @@ class EngineProxy(AbstractEngine):
            node not in self._things_cache[char]:
             raise KeyError("No such node")
         if node in self._things_cache[char]:
-            del self._things_cache[char][node]
+            self._recycle_thing(self._things_cache[char].pop(node))
         if node in self._character_places_cache[char]:  # just to be safe
-            del self._character_places_cache[char][node]
+            self._recycle_place(self._character_places_cache[char].pop(node))
         self.handle(
             command='del_node',
             char=char,
@@ -2251,8 +2469,14 @@ class EngineProxy(AbstractEngine):
         self.handle('commit', silent=True)
 
     def close(self):
-        self.handle(command='close', silent=True)
+        # A pipeline would hold 'close' until it exits, after the
+        # shutdown had already gone out, so send it directly
+        self._flush_pipeline()
+        with self._handle_lock:
+            self.send(self.json_dump({'command': 'close', 'silent': True}))
         self.send('shutdown')
+        self._time_travel_jobs.put(None)
+        self._time_travel_thread.join()
 
 
 def subprocess(
@@ -2276,6 +2500,7 @@ def subprocess(
             )
         logq.put(('debug', logs))
     engine_handle = EngineHandle(args, kwargs, logq, loglevel=loglevel)
+    get_command = engine_handle.get_command
 
     while True:
         inst = handle_out_pipe.recv()
@@ -2288,9 +2513,15 @@ def subprocess(
         silent = instruction.pop('silent',  False)
         cmd = instruction.pop('command')
         log('command', (cmd, instruction))
-        r = getattr(engine_handle, cmd)(**instruction)
+        r = get_command(cmd)(**instruction)
         if silent:
             continue
+        if isinstance(r, GeneratorType):
+            for item in r:
+                log('result', item)
+                handle_in_pipe.send((cmd, engine_handle.json_dump(item)))
+            handle_in_pipe.send((cmd, None))
+            continue
         log('result', r)
         handle_in_pipe.send((cmd,  engine_handle.json_dump(r)))
 
@@ -460,6 +460,27 @@ class QueryEngine(allegedb.query.QueryEngine):
     def func_table_name_plaincode(self, tbl):
         return self.sql('func_{}_name_plaincode'.format(tbl))
 
+    def func_table_items(self, tbl, use_globals=True):
+        """Yield (name, function) for everything in the table that
+        unmarshals.
+
+        """
+        globd = (
+            globals() if use_globals is True else
+            use_globals if isinstance(use_globals, dict) else
+            {}
+        )
+        for (name, bytecode) in self.sql(
+                'func_{}_name_bytecode'.format(tbl)
+        ):
+            try:
+                code = unmarshalled(bytecode)
+            except (EOFError, ValueError, TypeError):
+                # leave it for func_table_get to complain about, if
+                # anyone ever asks for it
+                continue
+            yield name, FunctionType(code, globd)
+
     def func_table_contains(self, tbl, key):
         for row in self.sql('func_{}_get'.format(tbl), key):
             return True
@@ -1315,6 +1336,30 @@ class QueryEngine(allegedb.query.QueryEngine):
                 tick
             )
 
+    def things_loc_and_next_set(self, character, branch, tick, rows):
+        """Set the locations of many things in one character at once.
+
+        ``rows`` are ``(thing, loc, nextloc)`` triples. They're
+        inserted in one batch; if any of them were already set at
+        this tick, fall back to setting them one by one.
+
+        """
+        dump = self.json_dump
+        charn = dump(character)
+        try:
+            self.sqlmany('thing_loc_and_next_ins', *(
+                (
+                    charn, dump(thing), branch, tick,
+                    dump(loc) if loc else None,
+                    dump(nextloc) if nextloc else None
+                ) for (thing, loc, nextloc) in rows
+            ))
+        except IntegrityError:
+            for (thing, loc, nextloc) in rows:
+                self.thing_loc_and_next_set(
+                    character, thing, branch, tick, loc, nextloc
+                )
+
     def thing_loc_items(self, character, branch, tick):
         character = self.json_dump(character)
         seen = set()
@@ -514,10 +514,7 @@ class RuleMapping(MutableMapping, Signal):
         )
 
     def __len__(self):
-        n = 0
-        for rule in self:
-            n += 1
-        return n
+        return sum(1 for _ in self)
 
     def __contains__(self, k):
         return k in self.rulebook
@@ -1,71 +1,160 @@
 import unittest
 import re
-from functools import reduce
-from collections import defaultdict
+from itertools import groupby, islice
+from logging import getLogger, FileHandler, ERROR
+from logging.handlers import MemoryHandler
+from operator import itemgetter
+from collections import defaultdict, deque
+import allegedb.cache
 from allegedb.cache import StructuredDefaultDict, WindowDict
 from LiSE.engine import Engine
 from LiSE.examples import college as sim
 
 
-def deepDictDiffIter(d0, d1, lvl=0):
-    tabs = "\t" * lvl
-    if d0.keys() != d1.keys():
-        deld = set(d0.keys()) - set(d1.keys())
-        addd = set(d1.keys()) - set(d0.keys())
-        if deld:
-            for k in sorted(deld):
-                yield tabs + str(k) + " deleted"
-        if addd:
-            for k in sorted(addd):
-                yield tabs + str(k) + " added"
-    for k in sorted(set(d0.keys()).intersection(d1.keys())):
-        if d0[k] != d1[k]:
-            if isinstance(d0[k], dict) and isinstance(d1[k], dict):
-                yield "{}{}:".format(tabs, k)
-                yield from deepDictDiffIter(d0[k], d1[k], lvl+1)
+allegedb.cache.TESTING = True
+
+student_name_re = re.compile(r'dorm(\d)room(\d)student(\d)')
+character_rulebook_types = (
+    'character',
+    'avatar',
+    'character_thing',
+    'character_place',
+    'character_node',
+    'character_portal'
+)
+
+
+def deepDictDiffIter(root0, root1):
+    # The stack holds lines ready to yield, and (tabs, d0, d1) frames
+    # still to be compared. Both go on in reverse so they come off in
+    # the same order a depth-first recursion would produce them.
+    stack = deque([("", root0, root1)])
+    while stack:
+        frame = stack.pop()
+        if isinstance(frame, str):
+            yield frame
+            continue
+        (tabs, d0, d1) = frame
+        # Keys come out in the order the dicts hold them, which is
+        # deterministic without paying to sort every level.
+        keys0 = d0.keys()
+        keys1 = d1.keys()
+        if keys0 != keys1:
+            for k in keys0:
+                if k not in keys1:
+                    yield tabs + str(k) + " deleted"
+            for k in keys1:
+                if k not in keys0:
+                    yield tabs + str(k) + " added"
+        todo = []
+        for k in keys0:
+            if k not in keys1:
+                continue
+            if d0[k] != d1[k]:
+                if isinstance(d0[k], dict) and isinstance(d1[k], dict):
+                    todo.append("{}{}:".format(tabs, k))
+                    todo.append((tabs + "\t", d0[k], d1[k]))
+                else:
+                    todo.append("{}{}: {} != {}".format(tabs, k, d0[k], d1[k]))
+        stack.extend(reversed(todo))
+
+
+def count_up_to(iterable, limit):
+    """Count the items in ``iterable``, but stop looking at ``limit``."""
+    return sum(1 for _ in islice(iterable, limit))
+
+
+def flatten(tree, depth):
+    """Return a dict of whatever is ``depth`` levels into ``tree``, keyed by
+    the tuple of keys that leads there.
+
+    An empty level above ``depth`` is kept, under its shorter key, so
+    that it still counts when comparing.
+
+    """
+    flat = {}
+    stack = [((), tree)]
+    while stack:
+        (path, d) = stack.pop()
+        for (k, v) in d.items():
+            if len(path) + 1 == depth or not v:
+                flat[path + (k,)] = v
             else:
-                yield "{}{}: {} != {}".format(tabs, k, d0[k], d1[k])
+                stack.append((path + (k,), v))
+    return flat
 
 
 class TestCase(unittest.TestCase):
+    maxDiffLines = 200
+    """How many lines of a dict diff to report before giving up."""
+
     def assertDictEqual(self, d0, d1, msg=None):
         if d0 != d1:
+            diffs = deepDictDiffIter(d0, d1)
+            lines = list(islice(diffs, self.maxDiffLines))
+            if next(diffs, None) is not None:
+                lines.append("...")
             self.fail(self._formatMessage(
                 msg,
                 self._truncateMessage(
                     "Dicts not equal. Sizes {}, {}\n".format(
                         len(d0), len(d1)
-                    ), "\n".join(deepDictDiffIter(d0, d1))
+                    ), "\n".join(lines)
                 )
             ))
 
 
 class SimTest(TestCase):
     maxDiff = None
-    def setUp(self):
+
+    @classmethod
+    def setUpClass(cls):
         """Start an engine, install the sim module, and run it a while.
 
-        This gives us some world-state to test upon.
+        This gives us some world-state to test upon. The tests only
+        read it, so it's built once and shared between them.
+
+        The engine's debug log goes to ``test.log``. Records are
+        buffered in memory and written in batches, or as soon as
+        something logs an error. The file isn't opened until there's
+        something to write.
 
         """
-        from logging import getLogger, FileHandler
-        self.engine = Engine(":memory:")
+        cls.log_handler = MemoryHandler(
+            10000, ERROR, FileHandler('test.log', delay=True)
+        )
         logger = getLogger('LiSE.engine')
         logger.setLevel('DEBUG')
-        logger.addHandler(FileHandler('test.log'))
-        sim.install(self.engine)
+        logger.addHandler(cls.log_handler)
+        cls.engine = Engine(":memory:")
+        sim.install(cls.engine)
         for i in range(72):
-            self.engine.next_tick()
-        self.engine.commit()
+            cls.engine.next_tick()
+        cls.engine.commit()
+        cls.time = (cls.engine.branch, cls.engine.tick)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Close my engine, then write out and detach the log."""
+        cls.engine.close()
+        getLogger('LiSE.engine').removeHandler(cls.log_handler)
+        target = cls.log_handler.target
+        cls.log_handler.close()
+        target.close()
 
     def tearDown(self):
-        """Close my engine."""
-        self.engine.close()
+        """Make sure the test didn't move the shared engine."""
+        self.assertEqual((self.engine.branch, self.engine.tick), self.time)
 
     def testRulebooksCache(self):
-        rulebooks = defaultdict(list)
-        for (rulebook, rule) in self.engine.rule.query.rulebooks_rules():
-            rulebooks[rulebook].append(rule)
+        # rows come sorted by rulebook, so each one is a single run
+        rulebooks = {
+            rulebook: [rule for (_, rule) in rows]
+            for (rulebook, rows) in groupby(
+                map(tuple, self.engine.rule.query.rulebooks_rules()),
+                key=itemgetter(0)
+            )
+        }
         # Ignoring empty rulebooks because those only exist
         # implicitly, they don't have database records
         oldrulebooks = {}
@@ -76,23 +165,9 @@ class SimTest(TestCase):
 
     def testCharRulebooksCaches(self):
         charrb = {}
-        for (
-                character,
-                character_rulebook,
-                avatar_rulebook,
-                character_thing_rulebook,
-                character_place_rulebook,
-                character_node_rulebook,
-                character_portal_rulebook
-        ) in self.engine.query.characters_rulebooks():
-            charrb[character] = {
-                'character': character_rulebook,
-                'avatar': avatar_rulebook,
-                'character_thing': character_thing_rulebook,
-                'character_place': character_place_rulebook,
-                'character_node': character_node_rulebook,
-                'character_portal': character_portal_rulebook
-            }
+        for (character, *rulebooks) in \
+                self.engine.query.characters_rulebooks():
+            charrb[character] = dict(zip(character_rulebook_types, rulebooks))
         self.assertDictEqual(
             charrb,
             self.engine._characters_rulebooks_cache._data
@@ -103,8 +178,8 @@ class SimTest(TestCase):
         for (character, node, rulebook) in self.engine.query.nodes_rulebooks():
             noderb[character][node] = rulebook
         self.assertDictEqual(
-            noderb,
-            self.engine._nodes_rulebooks_cache._data
+            flatten(noderb, 2),
+            flatten(self.engine._nodes_rulebooks_cache._data, 2)
         )
 
     def testPortalRulebooksCache(self):
@@ -112,8 +187,8 @@ class SimTest(TestCase):
         for (character, nodeA, nodeB, rulebook) in self.engine.query.portals_rulebooks():
             portrb[character][nodeA][nodeB] = rulebook
         self.assertDictEqual(
-            portrb,
-            self.engine._portals_rulebooks_cache._data
+            flatten(portrb, 3),
+            flatten(self.engine._portals_rulebooks_cache._data, 3)
         )
 
     def testAvatarnessCaches(self):
@@ -122,97 +197,61 @@ class SimTest(TestCase):
             user_avatarness[graph][node][character][branch][tick] = is_avatar
         new_user_avatarness = StructuredDefaultDict(3, WindowDict)
         usr = self.engine._avatarness_cache.user_order
-        for graph in usr:
-            for node in usr[graph]:
-                for char in usr[graph][node]:
-                    if usr[graph][node][char]:
-                        for branch in usr[graph][node][char]:
-                            for tick, is_avatar in usr[graph][node][char][branch].items():
-                                new_user_avatarness[graph][node][char][branch][tick] = is_avatar
+        for graph, graph_d in usr.items():
+            for node, node_d in graph_d.items():
+                for char, char_d in node_d.items():
+                    if not char_d:
+                        continue
+                    new_char_d = new_user_avatarness[graph][node][char]
+                    for branch, branch_d in char_d.items():
+                        if branch_d:
+                            new_char_d[branch] = WindowDict(branch_d)
         self.assertDictEqual(
-            user_avatarness,
-            new_user_avatarness
+            flatten(user_avatarness, 4),
+            flatten(new_user_avatarness, 4)
         )
 
     def testNodeRulesHandledCache(self):
-        node_rules_handled_ticks = defaultdict(  # character:
-            lambda: defaultdict(  # node:
-                lambda: defaultdict(  # rulebook:
-                    lambda: defaultdict(  # rule:
-                        lambda: defaultdict(  # branch:
-                            set  # ticks handled
-                        )
-                    )
-                )
-            )
-        )
-        new_node_rules_handled_ticks = defaultdict(  # character:
-            lambda: defaultdict(  # node:
-                lambda: defaultdict(  # rulebook:
-                    lambda: defaultdict(  # rule:
-                        dict
-                    )
-                )
-            )
-        )
+        # keyed by (character, node, rulebook, rule, branch)
+        node_rules_handled_ticks = defaultdict(set)
+        new_node_rules_handled_ticks = {}
         cache = self.engine._node_rules_handled_cache._data
-        for char in cache:
-            for node in cache[char]:
-                for rulebook in cache[char][node]:
-                    for rule in cache[char][node][rulebook]:
-                        if cache[char][node][rulebook][rule]:
+        for char, char_d in cache.items():
+            for node, node_d in char_d.items():
+                for rulebook, rulebook_d in node_d.items():
+                    for rule, rule_d in rulebook_d.items():
+                        for branch, ticks in rule_d.items():
                             new_node_rules_handled_ticks[
-                                char][node][rulebook][rule] \
-                                = cache[char][node][rulebook][rule]
+                                char, node, rulebook, rule, branch
+                            ] = ticks
         for character, node, rulebook, rule, branch, tick in \
                 self.engine.query.dump_node_rules_handled():
             node_rules_handled_ticks[
-                character][node][rulebook][rule][branch].add(tick)
+                character, node, rulebook, rule, branch].add(tick)
         self.assertDictEqual(
             node_rules_handled_ticks,
             new_node_rules_handled_ticks
         )
 
     def testPortalRulesHandledCache(self):
-        portal_rules_handled_ticks = defaultdict(  # character:
-            lambda: defaultdict(  # nodeA:
-                lambda: defaultdict(  # nodeB:
-                    lambda: defaultdict(  # rulebook:
-                        lambda: defaultdict(  # rule:
-                            lambda: defaultdict(  # branch:
-                                set  # ticks handled
-                            )
-                        )
-                    )
-                )
-            )
-        )
-        new_portal_rules_handled_ticks = defaultdict(  # character:
-            lambda: defaultdict(  # nodeA:
-                lambda: defaultdict(  # nodeB:
-                    lambda: defaultdict(  # rulebook:
-                        lambda: defaultdict(  # rule:
-                            dict
-                        )
-                    )
-                )
-            )
-        )
+        # keyed by (character, nodeA, nodeB, rulebook, rule, branch)
+        portal_rules_handled_ticks = defaultdict(set)
+        new_portal_rules_handled_ticks = {}
         cache = self.engine._portal_rules_handled_cache._data
-        for character in cache:
-            for nodeA in cache[character]:
-                for nodeB in cache[character][nodeA]:
-                    for rulebook in cache[character][nodeA][nodeB]:
-                        for rule in cache[character][nodeA][nodeB][rulebook]:
-                            if cache[character][nodeA][nodeB][rulebook][rule]:
+        for character, char_d in cache.items():
+            for nodeA, nodeA_d in char_d.items():
+                for nodeB, nodeB_d in nodeA_d.items():
+                    for rulebook, rulebook_d in nodeB_d.items():
+                        for rule, rule_d in rulebook_d.items():
+                            for branch, ticks in rule_d.items():
                                 new_portal_rules_handled_ticks[
-                                    character][nodeA][nodeB][rulebook][rule] \
-                                    = cache[character][nodeA][nodeB][
-                                        rulebook][rule]
+                                    character, nodeA, nodeB,
+                                    rulebook, rule, branch
+                                ] = ticks
         for (character, nodeA, nodeB, idx, rulebook, rule, branch, tick) \
                 in self.engine.query.dump_portal_rules_handled():
             portal_rules_handled_ticks[
-                character][nodeA][nodeB][rulebook][rule][branch].add(tick)
+                character, nodeA, nodeB, rulebook, rule, branch].add(tick)
         self.assertDictEqual(
             portal_rules_handled_ticks,
             new_portal_rules_handled_ticks
@@ -220,6 +259,7 @@ class SimTest(TestCase):
 
     def testCharRulesHandledCaches(self):
         live = self.engine._character_rules_handled_cache._data
+        query = self.engine.query
         for rulemap in [
                 'character',
                 'avatar',
@@ -227,18 +267,21 @@ class SimTest(TestCase):
                 'character_place',
                 'character_portal'
         ]:
-            handled_ticks = StructuredDefaultDict(2, set)
+            # keyed by (character, rule, branch)
+            handled_ticks = defaultdict(set)
             for character, rulebook, rule, branch, tick in getattr(
-                    self.engine.query, 'handled_{}_rules'.format(rulemap)
+                    query, 'handled_{}_rules'.format(rulemap)
             )():
-                handled_ticks[character][rule][branch].add(tick)
-            old_handled_ticks = StructuredDefaultDict(2, set)
-            for character in live:
-                if live[character][rulemap]:
-                    for rule in live[character][rulemap]:
-                        for branch, ticks in live[character][rulemap][rule].items():
-                            self.assertIsInstance(ticks, set)
-                            old_handled_ticks[character][rule][branch] = ticks
+                handled_ticks[character, rule, branch].add(tick)
+            old_handled_ticks = {}
+            for character, rulemaps in live.items():
+                live_rulemap = rulemaps.get(rulemap)
+                if not live_rulemap:
+                    continue
+                for rule, branches in live_rulemap.items():
+                    for branch, ticks in branches.items():
+                        self.assertIsInstance(ticks, set)
+                        old_handled_ticks[character, rule, branch] = ticks
             self.assertDictEqual(
                 old_handled_ticks,
                 handled_ticks,
@@ -251,33 +294,61 @@ class SimTest(TestCase):
                 self.engine.query.things_dump():
             things[(character,)][thing][branch][tick] = (loc, nextloc)
         self.assertDictEqual(
-            things,
-            self.engine._things_cache.keys
+            flatten(things, 3),
+            flatten(self.engine._things_cache.keys, 3)
+        )
+
+    def testUniversal(self):
+        universal = self.engine.universal
+        self.assertIn('rando_state', universal)
+        self.assertIn('rando_state', list(universal))
+        self.assertEqual(len(universal), len(list(universal)))
+        self.assertEqual(
+            tuple(universal['rando_state'][1]),
+            self.engine.rando.getstate()[1]
         )
 
+    def testPortals(self):
+        for character in self.engine.character.values():
+            self.assertEqual(
+                sorted(
+                    (port.origin.name, port.destination.name)
+                    for port in character.portals()
+                ),
+                sorted(
+                    (orig, dest)
+                    for orig in character.portal
+                    for dest in character.portal[orig]
+                )
+            )
+
     def testRoommateCollisions(self):
         """Test queries' ability to tell that all of the students that share
         rooms have been in the same place.
 
         """
+        match = student_name_re.match
+        ticks_when = self.engine.ticks_when
+        characters = self.engine.character
         done = set()
-        for chara in self.engine.character.values():
-            if chara.name in done:
+        for chara in characters.values():
+            if chara.name in done or not chara.name.startswith('dorm'):
                 continue
-            match = re.match('dorm(\d)room(\d)student(\d)', chara.name)
-            if not match:
+            m = match(chara.name)
+            if not m:
                 continue
-            dorm, room, student = match.groups()
+            dorm, room, student = m.groups()
             other_student = 1 if student == 0 else 0
             student = chara
-            other_student = self.engine.character[
+            other_student = characters[
                 'dorm{}room{}student{}'.format(dorm, room, other_student)
             ]
-            
-            same_loc_ticks = list(self.engine.ticks_when(
+
+            # Only need to know there are more than 6, not how many
+            same_loc_ticks = count_up_to(ticks_when(
                 student.avatar.only.historical('location')
                 == other_student.avatar.only.historical('location')
-            ))
+            ), 7)
             self.assertTrue(
                 same_loc_ticks,
                 "{} and {} don't seem to share a room".format(
@@ -285,7 +356,7 @@ class SimTest(TestCase):
                 )
             )
             self.assertGreater(
-                len(same_loc_ticks),
+                same_loc_ticks,
                 6,
                 "{} and {} share their room for less than 6 ticks".format(
                     student.name, other_student.name
@@ -306,13 +377,23 @@ class SimTest(TestCase):
         ]
 
         assert students
+        ticks_when = self.engine.ticks_when
+        classroom = self.engine.alias('classroom')
+        location = {
+            stu.name: stu.avatar.only.historical('location')
+            for stu in students
+        }
+        ticks_in_class = {
+            name: list(ticks_when(loc == classroom))
+            for (name, loc) in location.items()
+        }
 
-        def sameClasstime(stu0, stu1):
+        for stu0, stu1 in zip(students, students[1:]):
             self.assertTrue(
-                self.engine.ticks_when(
-                    stu0.avatar.only.historical('location') ==
-                    stu1.avatar.only.historical('location') ==
-                    self.engine.alias('classroom')
+                ticks_when(
+                    location[stu0.name] ==
+                    location[stu1.name] ==
+                    classroom
                 ),
                 "{stu0} seems not to have been in the classroom "
                 "at the same time as {stu1}.\n"
@@ -320,55 +401,91 @@ class SimTest(TestCase):
                 "{stu1} was there at ticks {ticks1}".format(
                     stu0=stu0.name,
                     stu1=stu1.name,
-                    ticks0=list(self.engine.ticks_when(stu0.avatar.only.historical('location') == self.engine.alias('classroom'))),
-                    ticks1=list(self.engine.ticks_when(stu1.avatar.only.historical('location') == self.engine.alias('classroom')))
+                    ticks0=ticks_in_class[stu0.name],
+                    ticks1=ticks_in_class[stu1.name]
                 )
             )
-            return stu1
-
-        reduce(sameClasstime, students)
 
     def testNoncollision(self):
         """Make sure students *not* from the same room never go there together"""
-        dorm = defaultdict(lambda: defaultdict(dict))
+        match = student_name_re.match
+        ticks_when = self.engine.ticks_when
+        alias = self.engine.alias
+        students = []
+        location = {}
+        rooms = {}
+        commons = {}
         for character in self.engine.character.values():
-            match = re.match('dorm(\d)room(\d)student(\d)', character.name)
-            if not match:
+            if not character.name.startswith('dorm'):
                 continue
-            d, r, s = match.groups()
-            dorm[d][r][s] = character
-        for d in dorm:
-            other_dorms = [dd for dd in dorm if dd != d]
-            for r in dorm[d]:
-                other_rooms = [rr for rr in dorm[d] if rr != r]
-                for stu0 in dorm[d][r].values():
-                    for rr in other_rooms:
-                        for stu1 in dorm[d][rr].values():
-                            self.assertFalse(
-                                self.engine.ticks_when(
-                                    stu0.avatar.only.historical('location') ==
-                                    stu1.avatar.only.historical('location') ==
-                                    self.engine.alias('dorm{}room{}'.format(d, r))
-                                ),
-                                "{} seems to share a room with {}".format(
-                                    stu0.name, stu1.name
-                                )
+            m = match(character.name)
+            if not m:
+                continue
+            d, r, s = m.groups()
+            students.append((d, r, character))
+            location[character.name] \
+                = character.avatar.only.historical('location')
+            if (d, r) not in rooms:
+                rooms[d, r] = alias('dorm{}room{}'.format(d, r))
+            if d not in commons:
+                commons[d] = alias('common{}'.format(d))
+        # Each unordered pair comes up once, so check both students'
+        # rooms, or both dorms' common rooms, while we have it.
+        for i, (d0, r0, stu0) in enumerate(students):
+            for (d1, r1, stu1) in students[i+1:]:
+                if d0 == d1:
+                    if r0 == r1:
+                        continue
+                    for (stu, other, room) in (
+                            (stu0, stu1, rooms[d0, r0]),
+                            (stu1, stu0, rooms[d1, r1])
+                    ):
+                        self.assertFalse(
+                            ticks_when(
+                                location[stu.name] ==
+                                location[other.name] ==
+                                room
+                            ),
+                            "{} seems to share a room with {}".format(
+                                stu.name, other.name
                             )
-                    common = 'common{}'.format(d)
-                    for dd in other_dorms:
-                        for rr in dorm[dd]:
-                            for stu1 in dorm[dd][rr].values():
-                                self.assertFalse(
-                                    self.engine.ticks_when(
-                                        stu0.avatar.only.historical('location') ==
-                                        stu1.avatar.only.historical('location') ==
-                                        self.engine.alias(common)
-                                    ),
-                                    "{} seems to have been in the same"
-                                    "common room  as {}".format(
-                                        stu0.name, stu1.name
-                                    )
-                                )
+                        )
+                else:
+                    for (stu, other, common) in (
+                            (stu0, stu1, commons[d0]),
+                            (stu1, stu0, commons[d1])
+                    ):
+                        self.assertFalse(
+                            ticks_when(
+                                location[stu.name] ==
+                                location[other.name] ==
+                                common
+                            ),
+                            "{} seems to have been in the same"
+                            "common room  as {}".format(
+                                stu.name, other.name
+                            )
+                        )
+
+
+class RandomTest(TestCase):
+    def setUp(self):
+        self.engine = Engine(":memory:", random_seed=0)
+
+    def tearDown(self):
+        self.engine.close()
+
+    def testPercentChance(self):
+        chance = self.engine.percent_chance
+        self.assertFalse(any(chance(0) for _ in range(100)))
+        self.assertTrue(all(chance(100) for _ in range(100)))
+        hits = sum(chance(10) for _ in range(10000))
+        self.assertTrue(800 < hits < 1200, hits)
+
+    def testCoinflip(self):
+        flips = [self.engine.coinflip() for _ in range(1000)]
+        self.assertEqual({type(flip) for flip in flips}, {bool})
+        self.assertTrue(400 < sum(flips) < 600, sum(flips))
 
 
 if __name__ == '__main__':
@@ -157,7 +157,7 @@ class EntityStatAccessor(object):
         if self.current:
             res = self.entity[self.stat]
         else:
-            time = self.engine.time
+            time = tuple(self.engine.time)
             self.engine.time = (branch or self.branch, tick or self.tick)
             res = self.entity[self.stat]
             self.engine.time = time
@@ -2,9 +2,33 @@
 # Copyright (c) Zachary Spector,  zacharyspector@gmail.com
 """Common classes for collections in LiSE, of which most can be bound to."""
 from collections import Mapping, MutableMapping
+from string import Formatter
 from blinker import Signal
 
 
+formatter = Formatter()
+
+
+def parse_template(s):
+    """Split ``s`` into pairs of literal text and the name of the field
+    that follows it, or ``None`` where there's no field.
+
+    Return ``None`` instead if ``s`` has fields that need the full
+    ``str.format`` treatment: positional fields, attribute or index
+    lookups, conversions, or format specs.
+
+    """
+    segs = []
+    for (literal, name, spec, conversion) in formatter.parse(s):
+        if name is not None and (
+                spec or conversion or not name or name.isdigit() or
+                '.' in name or '[' in name
+        ):
+            return
+        segs.append((literal, name))
+    return segs
+
+
 class NotThatMap(Mapping):
     """Wraps another mapping and conceals exactly one of its keys."""
     __slots__ = ['inner', 'k']
@@ -55,7 +79,6 @@ class AbstractLanguageDescriptor(Signal):
     def __set__(self, inst, val):
         self._set_language(inst, val)
         self.lang = Language(self, val)
-        inst.cache = {}
         self.send(inst, language=val)
 
     def __str__(self):
@@ -69,6 +92,9 @@ class LanguageDescriptor(AbstractLanguageDescriptor):
     def _set_language(self, inst, val):
         inst._language = val
         inst.query.global_set('language', val)
+        inst.cache = {}
+        inst._parsed = {}
+        inst._loaded = False
 
 
 class StringStore(MutableMapping, Signal):
@@ -92,50 +118,88 @@ class StringStore(MutableMapping, Signal):
         self.query.init_string_table(table)
         self.table = table
         self._language = lang
-        self.cache = dict(self.query.string_table_lang_items(
+        self.cache = {}
+        self._parsed = {}
+        self._loaded = False
+
+    def _load(self):
+        """Fetch all the strings in the current language at once.
+
+        Strings already in the cache are kept.
+
+        """
+        cache = self.cache
+        for (k, v) in self.query.string_table_lang_items(
                 self.table, self.language
-        ))
+        ):
+            cache.setdefault(k, v)
+        self._loaded = True
 
     def commit(self):
         self.query.commit()
 
     def __iter__(self):
+        if not self._loaded:
+            self._load()
         return iter(self.cache)
 
     def __len__(self):
+        if not self._loaded:
+            self._load()
         return len(self.cache)
 
     def __getitem__(self, k):
         """Get the string and format it with other strings here."""
+        if not self._loaded:
+            self._load()
         if k not in self.cache:
-            v = self.query.string_table_get(
-                self.table, self.language, k
-            )
-            if v is None:
-                raise KeyError("No string named {}".format(k))
-            self.cache[k] = v
-        return self.cache[k].format_map(NotThatMap(self, k))
+            raise KeyError("No string named {}".format(k))
+        v = self.cache[k]
+        if '{' not in v and '}' not in v:
+            return v
+        if k not in self._parsed:
+            self._parsed[k] = parse_template(v)
+        segs = self._parsed[k]
+        if segs is None:
+            return v.format_map(NotThatMap(self, k))
+        return ''.join(self._render(k, segs))
+
+    def _render(self, k, segs):
+        for (literal, name) in segs:
+            yield literal
+            if name is not None:
+                if name == k:
+                    raise KeyError("masked")
+                yield self[name]
 
     def __setitem__(self, k, v):
         """Set the value of a string for the current language."""
         self.cache[k] = v
+        self._parsed.pop(k, None)
         self.query.string_table_set(self.table, self.language, k, v)
-        self.send(self, key=k, val=v)
+        if self.receivers:
+            self.send(self, key=k, val=v)
 
     def __delitem__(self, k):
         """Delete the string from the current language, and remove it from the
         cache.
 
         """
+        if not self._loaded:
+            self._load()
         del self.cache[k]
+        self._parsed.pop(k, None)
         self.query.string_table_del(self.table, self.language, k)
-        self.send(self, key=k, val=None)
+        if self.receivers:
+            self.send(self, key=k, val=None)
 
     def lang_items(self, lang=None):
         """Yield pairs of (id, string) for the given language."""
         if lang is None:
             lang = self.language
         if lang == self.language:
+            if not self._loaded:
+                self._load()
             yield from self.cache.items()
             return
         yield from self.query.string_table_lang_items(
@@ -163,7 +227,7 @@ class StoredPartial(object):
 
 class FunctionStore(MutableMapping, Signal):
     """Store functions in a SQL database"""
-    __slots__ = ['engine', 'query', '_tab', 'cache']
+    __slots__ = ['engine', 'query', '_tab', 'cache', '_name_set']
 
     def __init__(self, engine, query, table):
         """Use ``codedb`` as a connection object. Connect to it, and
@@ -176,11 +240,33 @@ class FunctionStore(MutableMapping, Signal):
         self.query.init_table(table)
         self._tab = table
         self.cache = {}
+        self._name_set = None
         self.engine.query.init_func_table(table)
 
+    def _names(self):
+        """Return the set of all function names here, fetching it from the
+        database the first time.
+
+        """
+        if self._name_set is None:
+            self._name_set = {
+                row[0] for row in self.query.func_table_iter(self._tab)
+            }
+        return self._name_set
+
+    def _load(self):
+        """Fetch and rebuild all the functions here at once.
+
+        Functions already in the cache are kept.
+
+        """
+        cache = self.cache
+        for (name, fun) in self.query.func_table_items(self._tab):
+            cache.setdefault(name, fun)
+
     def __len__(self):
         """Return count of all functions here."""
-        return self.query.count_all_table(self._tab)
+        return len(self._names())
 
     def __iter__(self):
         """Iterate over function names in alphabetical order."""
@@ -191,9 +277,7 @@ class FunctionStore(MutableMapping, Signal):
         """Check if there's such a function in the database"""
         if not isinstance(name, str):
             return False
-        if name in self.cache:
-            return True
-        return self.query.func_table_contains(self._tab, name)
+        return name in self.cache or name in self._names()
 
     def __getitem__(self, name):
         """Reconstruct the named function from its code string stored in the
@@ -226,14 +310,20 @@ class FunctionStore(MutableMapping, Signal):
             )
         self.query.func_table_set(self._tab, fun.__name__, fun)
         self.cache[fun.__name__] = fun
-        self.send(self, key=fun.__name__, val=fun)
+        if self._name_set is not None:
+            self._name_set.add(fun.__name__)
+        if self.receivers:
+            self.send(self, key=fun.__name__, val=fun)
         return fun
 
     def __setitem__(self, name, fun):
         """Store the function, marshalled, under the name given."""
         self.query.func_table_set(self._tab, name, fun)
         self.cache[name] = fun
-        self.send(self, key=name, val=fun)
+        if self._name_set is not None:
+            self._name_set.add(name)
+        if self.receivers:
+            self.send(self, key=name, val=fun)
 
     def __delitem__(self, name):
         """Delete the named function from both the cache and the database.
@@ -245,7 +335,10 @@ class FunctionStore(MutableMapping, Signal):
         self.query.func_table_del(self._tab, name)
         if name in self.cache:
             del self.cache[name]
-        self.send(self, key=name, val=None)
+        if self._name_set is not None:
+            self._name_set.discard(name)
+        if self.receivers:
+            self.send(self, key=name, val=None)
 
     def plain(self, k):
         """Return the plain source code of the function."""
@@ -292,28 +385,41 @@ class UniversalMapping(MutableMapping, Signal):
         self.engine = engine
 
     def __iter__(self):
-        return self.engine._universal_cache.iter_keys(*self.engine.time)
+        return self.engine._universal_cache.iter_keys(
+            None, *self.engine.time
+        )
 
     def __len__(self):
-        return self.engine._universal_cache.count_keys(*self.engine.time)
+        return self.engine._universal_cache.count_keys(
+            None, *self.engine.time
+        )
+
+    def __contains__(self, k):
+        return self.engine._universal_cache.contains_key(
+            None, k, *self.engine.time
+        )
 
     def __getitem__(self, k):
         """Get the current value of this key"""
-        return self.engine._universal_cache.retrieve(k, *self.engine.time)
+        return self.engine._universal_cache.retrieve(
+            None, k, *self.engine.time
+        )
 
     def __setitem__(self, k, v):
         """Set k=v at the current branch and tick"""
         (branch, tick) = self.engine.time
         self.engine.query.universal_set(k, branch, tick, v)
         self.engine._universal_cache.store(k, branch, tick, v)
-        self.send(self, key=k, val=v)
+        if self.receivers:
+            self.send(self, key=k, val=v)
 
     def __delitem__(self, k):
         """Unset this key for the present (branch, tick)"""
         branch, tick = self.engine.time
         self.engine.query.universal_del(k, branch, tick)
         self.engine._universal_cache.store(k, branch, tick, None)
-        self.send(self, key=k, val=None)
+        if self.receivers:
+            self.send(self, key=k, val=None)
 
 
 class CharacterMapping(MutableMapping, Signal):
@@ -354,12 +460,15 @@ class CharacterMapping(MutableMapping, Signal):
 
         """
         from .character import Character
-        if name not in self:
-            raise KeyError("No such character")
         cache = self.engine._graph_objs
-        if name not in cache:
-            cache[name] = Character(self.engine, name)
-        ret = cache[name]
+        try:
+            ret = cache[name]
+        except KeyError:
+            if not self.engine.query.have_character(name):
+                raise KeyError("No such character")
+            ret = cache[name] = Character(
+                self.engine, name, init_rulebooks=False
+            )
         if not isinstance(ret, Character):
             raise TypeError(
                 """Tried to get a graph that isn't a Character.
@@ -385,14 +494,16 @@ class CharacterMapping(MutableMapping, Signal):
             ch = self.engine._graph_objs[name] = Character(
                 self.engine, name, data=value
             )
-        self.send(self, key=name, val=ch)
+        if self.receivers:
+            self.send(self, key=name, val=ch)
 
     def __delitem__(self, name):
         """Delete the named character from both the cache and the database."""
         if name in self.engine._graph_objs:
             del self.engine._graph_objs[name]
         self.engine.query.del_character(name)
-        self.send(self, key=name, val=None)
+        if self.receivers:
+            self.send(self, key=name, val=None)
 
 
 class CompositeDict(Mapping):
@@ -157,17 +157,17 @@ class ORM(object):
         """
         if parent == 'trunk':
             return True
-        if child == 'trunk':
-            return False
-        if child not in self._parentbranch_rev:
-            raise ValueError(
-                "The branch {} seems not to have ever been created".format(
-                    child
+        while child != 'trunk':
+            if child not in self._parentbranch_rev:
+                raise ValueError(
+                    "The branch {} seems not to have ever been created".format(
+                        child
+                    )
                 )
-            )
-        if self._parentbranch_rev[child][0] == parent:
-            return True
-        return self.is_parent_of(parent, self._parentbranch_rev[child][0])
+            child = self._parentbranch_rev[child][0]
+            if child == parent:
+                return True
+        return False
 
     @property
     def branch(self):
@@ -7,18 +7,26 @@ methods. But if you need to store historical data some other way,
 you might want to store it in a ``WindowDict``.
 
 """
+from bisect import bisect_left
 from copy import copy as copier
 from collections import deque, MutableMapping, KeysView, ItemsView, ValuesView
 
 
-TESTING = True
-"""Change this to True to validate kecaches whenever they change.
+TESTING = False
+"""Change this to True to validate keycaches whenever they change.
 
-It will make things very slow.
+It will make things very slow. The test suites turn it on.
 
 """
 
 
+seek_steps = 8
+"""How far ``WindowDict.seek`` will walk before it bisects instead."""
+rebuild_ratio = 4
+"""``WindowDict.seek`` only copies the whole history when the jump
+covers at least one ``rebuild_ratio``th of it."""
+
+
 class HistoryError(KeyError):
     """You tried to access the past in a bad way."""
 
@@ -38,18 +46,30 @@ def within_history(rev, windowdict):
     return begin <= rev <= end
 
 
+def unshared_keys(keycache, rev):
+    """Return the set of keys in the keycache at the revision, ready to
+    be changed.
+
+    Neighboring revisions share one set until one of them changes.
+    If this revision's set is shared, replace it with a copy first.
+
+    """
+    keycache.seek(rev)
+    past = keycache._past
+    future = keycache._future
+    (r, keys) = past[-1]
+    if (len(past) > 1 and past[-2][1] is keys) or (
+            future and future[0][1] is keys
+    ):
+        keys = keys.copy()
+        past[-1] = (r, keys)
+    return keys
+
+
 class WindowDictKeysView(KeysView):
     """Look through all the keys a WindowDict contains."""
     def __contains__(self, rev):
-        if not within_history(rev, self._mapping):
-            return False
-        for mrev, mv in self._mapping._past:
-            if mrev == rev:
-                return True
-        for mrev, mv in self._mapping._future:
-            if mrev == rev:
-                return True
-        return False
+        return bool(self._mapping.has_exact_rev(rev))
 
     def __iter__(self):
         for rev, v in self._mapping._past:
@@ -62,15 +82,10 @@ class WindowDictItemsView(ItemsView):
     """Look through everything a WindowDict contains."""
     def __contains__(self, item):
         (rev, v) = item
-        if not within_history(rev, self._mapping):
+        mapping = self._mapping
+        if not mapping.has_exact_rev(rev):
             return False
-        for mrev, mv in self._mapping._past:
-            if mrev == rev:
-                return mv == v
-        for mrev, mv in self._mapping._future:
-            if mrev == rev:
-                return mv == v
-        return False
+        return mapping._past[-1][1] == v
 
     def __iter__(self):
         yield from self._mapping._past
@@ -113,16 +128,52 @@ class WindowDict(MutableMapping):
 
     def seek(self, rev):
         """Arrange the caches to help look up the given revision."""
-        # TODO: binary search? Perhaps only when one or the other
-        # deque is very large?
-        if self._past and self._past[-1][0] <= rev and (
-                not self._future or self._future[0][0] > rev
+        past = self._past
+        future = self._future
+        if past and past[-1][0] <= rev and (
+                not future or future[0][0] > rev
         ):
             return
-        while self._future and self._future[0][0] <= rev:
-            self._past.append(self._future.popleft())
-        while self._past and self._past[-1][0] > rev:
-            self._future.appendleft(self._past.pop())
+        # Walk a few steps, which is all it takes when looking up
+        # neighboring revisions...
+        for _ in range(seek_steps):
+            if future and future[0][0] <= rev:
+                past.append(future.popleft())
+            elif past and past[-1][0] > rev:
+                future.appendleft(past.pop())
+            else:
+                return
+        # ...but for a long jump, bisect the side we're moving into to
+        # find out how far it is, without copying anything.
+        if future and future[0][0] <= rev:
+            i = bisect_left(future, (rev,))
+            if i < len(future) and future[i][0] == rev:
+                i += 1
+            distance = i
+            split = len(past) + i
+        else:
+            j = bisect_left(past, (rev,))
+            if j < len(past) and past[j][0] == rev:
+                j += 1
+            distance = len(past) - j
+            split = j
+        if distance * rebuild_ratio < len(past) + len(future):
+            # Short enough to walk. This costs O(distance), like the
+            # steps above.
+            if split > len(past):
+                for _ in range(distance):
+                    past.append(future.popleft())
+            else:
+                for _ in range(distance):
+                    future.appendleft(past.pop())
+            return
+        # The jump covers a good part of the history, so rebuilding both
+        # deques in C costs less than walking there in Python, and no
+        # more than a constant factor of the distance.
+        history = list(past)
+        history.extend(future)
+        self._past = deque(history[:split])
+        self._future = deque(history[split:])
 
     def has_exact_rev(self, rev):
         """Return whether I have a value at this exact revision."""
@@ -194,26 +245,14 @@ class WindowDict(MutableMapping):
                 self._past.append((rev, v))
 
     def __delitem__(self, rev):
-        # Not checking for rev's presence at the beginning because
-        # to do so would likely require iterating thru history,
-        # which I have to do anyway in deleting.
-        # But handle degenerate case.
         if not within_history(rev, self):
             raise HistoryError("Rev outside of history: {}".format(rev))
-        name = '_past' if rev <= self._rev else '_future'
-        stack = getattr(self, name)
-        waste = deque()
-        setattr(self, name, waste)
-        deleted = False
-        while stack:
-            (r, v) = stack.popleft()
-            if r != rev:
-                waste.append((r, v))
-            else:
-                assert not deleted
-                deleted = True
-        if not deleted:
+        # seek leaves the latest rev not after this one at the end of
+        # _past, so there's nothing to search, or copy
+        self.seek(rev)
+        if not self._past or self._past[-1][0] != rev:
             raise HistoryError("Rev not present: {}".format(rev))
+        self._past.pop()
 
     def __repr__(self):
         ret = {
@@ -414,9 +453,11 @@ class Cache(object):
             try:
                 if not kc.has_exact_rev(rev):
                     if kc.rev_before(rev) == rev - 1:
-                        kc[rev] = kc[rev].copy()
+                        # share the previous revision's keys until
+                        # something changes them
+                        kc[rev] = kc[rev]
                     else:
-                        kc[rev] = set(slow_iter_keys(keys[parentity], branch, rev))
+                        kc[rev] = set(slow_iter_keys(keys.get(parentity, {}), branch, rev))
                 return kc[rev]
             except HistoryError:
                 pass
@@ -428,14 +469,15 @@ class Cache(object):
                 kc[rev] = keycache[other_branch_key][r].copy()
                 break
         else:
-            kc[rev] = set(slow_iter_keys(keys[parentity], branch, rev))
+            kc[rev] = set(slow_iter_keys(keys.get(parentity, {}), branch, rev))
         return kc[rev]
 
     def _forward_keycache(self, parentity, branch, rev):
         return self._forward_keycachelike(self.keycache, self.keys, self._slow_iter_keys, parentity, branch, rev)
 
     def _update_keycache(self, entpar, branch, rev, key, value):
-        kc = self._forward_keycache(entpar, branch, rev)
+        self._forward_keycache(entpar, branch, rev)
+        kc = unshared_keys(self.keycache[entpar+(branch,)], rev)
         if value is None:
             kc.discard(key)
         else:
@@ -536,9 +578,9 @@ class Cache(object):
                         and r in self.branches[entity+(key,)][b]
                 ):
                     v = self.branches[entity+(key,)][b][r]
+                    # the window finds this for any later rev, so there's
+                    # no need to store it again at the rev asked for
                     self.store(*entity+(key, branch, r, v))
-                    if rev > r:
-                        self.store(*entity+(key, branch, rev, v))
                     break
             else:
                 raise KeyError
@@ -592,10 +634,12 @@ class Cache(object):
         Any that come before that will be taken to identify the entity.
 
         """
-        try:
-            return self.shallower[args] is not None
-        except KeyError:
-            pass
+        # Most lookups aren't for the exact revision something was
+        # stored at, so don't make them pay for a KeyError. A stored
+        # None, meaning deleted, falls through to the keycache too,
+        # which knows the key is gone.
+        if self.shallower.get(args) is not None:
+            return True
         entity = args[:-3]
         key, branch, rev = args[-3:]
         self._forward_keycache(entity, branch, rev)
@@ -659,7 +703,8 @@ class EdgesCache(Cache):
         return self._forward_keycachelike(self.destcache, self.successors, self._slow_iter_successors, (graph, orig), branch, rev)
 
     def _update_destcache(self, graph, orig, branch, rev, dest, value):
-        kc = self._forward_destcache(graph, orig, branch, rev)
+        self._forward_destcache(graph, orig, branch, rev)
+        kc = unshared_keys(self.destcache[(graph, orig, branch)], rev)
         if value is None:
             kc.discard(dest)
         else:
@@ -670,7 +715,8 @@ class EdgesCache(Cache):
         return self._forward_keycachelike(self.origcache, self.predecessors, self._slow_iter_predecessors, (graph, dest), branch, rev)
 
     def _update_origcache(self, graph, dest, branch, rev, orig, value):
-        kc = self._forward_origcache(graph, dest, branch, rev)
+        self._forward_origcache(graph, dest, branch, rev)
+        kc = unshared_keys(self.origcache[(graph, dest, branch)], rev)
         if value is None:
             kc.discard(orig)
         else:
@@ -696,7 +742,7 @@ class EdgesCache(Cache):
     def count_successors(self, graph, orig, branch, rev):
         self._forward_destcache(graph, orig, branch, rev)
         try:
-            return len(self.destcache[(graph, orig, branch)])[rev]
+            return len(self.destcache[(graph, orig, branch)][rev])
         except KeyError:
             return 0
 
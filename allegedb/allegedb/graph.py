@@ -18,6 +18,28 @@ def getatt(attribute_name):
     return property(attrgetter(attribute_name))
 
 
+def is_same_value(old, new):
+    """Return whether storing ``new`` over ``old`` would change nothing.
+
+    Equal values of different types, like ``1`` and ``True``, aren't
+    the same. Neither is anything that could have been changed in
+    place behind my back.
+
+    """
+    if type(old) is not type(new):
+        return False
+    if type(new) is tuple:
+        return len(old) == len(new) and all(map(is_same_value, old, new))
+    if type(new) is frozenset:
+        # its members could be equal but of different types
+        return False
+    try:
+        hash(new)
+    except TypeError:
+        return False
+    return old == new
+
+
 def convert_to_networkx_graph(data, create_using=None, multigraph_input=False):
     """Convert an AllegedGraph to the corresponding NetworkX graph type."""
     if isinstance(data, AllegedGraph):
@@ -46,6 +68,18 @@ class NeatMapping(MutableMapping):
             self.__class__.__name__, self.graph.name, repr(dict(self))
         )
 
+    def replace(self, other):
+        """Make my contents match ``other``'s
+
+        Like ``clear`` followed by ``update``, but keys whose values
+        don't change are left alone, and don't get written again.
+
+        """
+        for k in list(self.keys()):
+            if k not in other:
+                del self[k]
+        self.update(other)
+
     def update(self, other):
         """Version of ``update`` that doesn't clobber the database so much"""
         iteratr = (
@@ -133,19 +167,26 @@ class AbstractEntityMapping(NeatMapping, Signal):
             )
         if self.db.caching:
             try:
-                if self._get_cache(key) != value:
-                    self._set_cache(key, value)
+                unchanged = is_same_value(self._get_cache(key), value)
             except KeyError:
-                self._set_cache(key, value)
+                unchanged = False
+            if unchanged:
+                # Nothing to write.
+                if self.receivers:
+                    self.send(self, key=key, value=value)
+                return
+            self._set_cache(key, value)
         self._set_db(key, value)
-        self.send(self, key=key, value=value)
+        if self.receivers:
+            self.send(self, key=key, value=value)
 
     def __delitem__(self, key):
         """Indicate that the key has no value at this time"""
         if self.db.caching:
             self._set_cache(key, None)
         self._del_db(key)
-        self.send(self, key=key, value=None)
+        if self.receivers:
+            self.send(self, key=key, value=None)
 
 
 class GraphMapping(AbstractEntityMapping):
@@ -634,8 +675,7 @@ class AbstractSuccessors(GraphEdgeMapping):
                 True
             )
         e = self[nodeB]
-        e.clear()
-        e.update(value)
+        e.replace(value)
         if created:
             self.created.send(self, edge=e)
 
@@ -997,8 +1037,7 @@ class MultiEdges(GraphEdgeMapping):
             True
         )
         e = self._getedge(idx)
-        e.clear()
-        e.update(val)
+        e.replace(val)
         if self.db.caching:
             self.db._edges_cache.store(
                 self.graph.name, self.nodeA, self.nodeB, idx,
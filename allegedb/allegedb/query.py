@@ -70,6 +70,19 @@ class QueryEngine(object):
 
     """
     json_path = xjpath
+    sqlite_pragmas = (
+        'temp_store=MEMORY',
+        'cache_size=-65536'
+    )
+    """Run on every sqlite3 connection I open myself. These only last
+    as long as the connection. Override in a subclass to tune them
+    differently, or set to ``()`` to leave SQLite's defaults alone.
+
+    ``journal_mode=WAL`` and ``synchronous=NORMAL`` make commits
+    cheaper, but aren't here by default: WAL is recorded in the
+    database file itself, and NORMAL gives up some durability.
+
+    """
 
     def __init__(
             self, dbstring, connect_args, alchemy,
@@ -113,6 +126,8 @@ class QueryEngine(object):
                     slashidx = dbstring.rindex('/')
                     dbstring = dbstring[slashidx+1:]
                 self.connection = connect(dbstring)
+                for pragma in self.sqlite_pragmas:
+                    self.connection.execute('PRAGMA ' + pragma)
 
         if alchemy:
             try:
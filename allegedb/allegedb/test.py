@@ -1,8 +1,11 @@
 import unittest
 from copy import deepcopy
 import allegedb
+import allegedb.cache
 
 
+allegedb.cache.TESTING = True
+
 testkvs = [0, 1, 10, 10**10, 10**10**4, 'spam', 'eggs', 'ham',  '💧', '🔑', '𐦖',('spam', 'eggs', 'ham')]
 testvs = [['spam', 'eggs', 'ham'], {'foo': 'bar', 0: 1, '💧': '🔑'}]
 testdata = []
@@ -161,6 +164,20 @@ class StorageTest(AllegedTest):
             self.engine.del_graph('testgraph')
 
 
+class EqualValueTest(AllegedTest):
+    def runTest(self):
+        """Test that setting a value equal to the old one, but of another
+        type, still replaces it.
+
+        """
+        g = self.engine.new_graph('testgraph')
+        for (old, new) in ((1, True), (True, 1.0), ((1, 2), (True, 2))):
+            g.graph['k'] = old
+            g.graph['k'] = new
+            self.assertIs(type(g.graph['k']), type(new))
+            self.assertEqual(repr(g.graph['k']), repr(new))
+
+
 class CompiledQueriesTest(AllegedTest):
     def runTest(self):
         """Make sure that the queries generated in SQLAlchemy are the same as
@@ -185,5 +202,38 @@ class CompiledQueriesTest(AllegedTest):
             )
 
 
+class WindowDictTest(unittest.TestCase):
+    def testSeek(self):
+        from allegedb.cache import WindowDict
+        revs = list(range(0, 200, 3))
+        wd = WindowDict({rev: str(rev) for rev in revs})
+        for rev in (5, 6, 7, 199, 198, 0, 100, 101, 50, 2, 150, 1):
+            expected = max(r for r in revs if r <= rev)
+            self.assertEqual(wd[rev], str(expected))
+            self.assertEqual(wd.rev_before(rev), expected)
+        self.assertEqual(list(wd), revs)
+
+    def testDelete(self):
+        from allegedb.cache import WindowDict, HistoryError
+        wd = WindowDict({rev: str(rev) for rev in range(0, 20, 2)})
+        del wd[10]
+        self.assertEqual(wd[11], '8')
+        del wd[0]
+        self.assertRaises(HistoryError, wd.__getitem__, 1)
+        self.assertRaises(HistoryError, wd.__delitem__, 5)
+        self.assertEqual(list(wd), [2, 4, 6, 8, 12, 14, 16, 18])
+
+    def testViews(self):
+        from allegedb.cache import WindowDict
+        wd = WindowDict({rev: str(rev) for rev in range(0, 200, 3)})
+        for rev in (150, 3, 198, 0, 99):
+            self.assertIn(rev, wd.keys())
+            self.assertIn((rev, str(rev)), wd.items())
+            self.assertNotIn((rev, 'x'), wd.items())
+        for rev in (151, 4, 199, -1, 100):
+            self.assertNotIn(rev, wd.keys())
+            self.assertNotIn((rev, str(rev)), wd.items())
+
+
 if __name__ == '__main__':
     unittest.main()
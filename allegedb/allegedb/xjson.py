@@ -3,6 +3,7 @@
 from collections import MutableMapping, MutableSequence
 from json import dumps, loads
 from copy import deepcopy
+from sys import intern
 
 
 def enc_tuple(o):
@@ -70,7 +71,10 @@ def json_load(s,  hint=True):
     if not hint:
         return dec_tuple(loads(s))
     if s not in json_load_hints:
-        json_load_hints[s] = dec_tuple(loads(s))
+        ret = dec_tuple(loads(s))
+        if isinstance(ret, str):
+            ret = intern(ret)
+        json_load_hints[s] = ret
     return json_load_hints[s]
 
 